@@ -11,20 +11,64 @@ Copyright (c) 2019 Marco P. L. Ribeiro
 """
 
 import os
-import subprocess
-import random
+import sys
+import threading
+
+# 'status' only reads the plan snapshot, so it returns before the GUI modules are imported
+if __name__ == '__main__' and sys.argv[1:2] == ['status']:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    from plan_snapshot import main
+    sys.exit(main())
+
 import tkinter as tk
-from tkinter import messagebox
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from functools import partial
 
-from read_write import read_settings_file, write_settings_file, read_saved_plan, write_saved_plan
+from read_write import read_settings_file, write_settings_file, read_saved_plan, write_saved_plan, load_settings_data, DEFAULT_TUNE_SETTINGS
 from my_tkinter_settings import configure_window
+from undo_journal import UndoJournal
+from block_grid import ActivityTable, BlockGrid, UNLINKED_ID
+from productive_index import ProductiveIndex
+from transition_scheduler import TransitionScheduler, compile_transitions, block_start
+from autosave import AutoSaver, AUTOSAVE_FILENAME
+from plan_wal import PlanWAL
+from status_surface import StatusWriter
+from plan_snapshot import write_plan_snapshot
+from day_plans import PlanPrefetcher, load_day_plan
+from plan_runs import archive_day_plan, history_filename, plan_runs, draw_runs
+
+# How often the settings file is checked for changes (milliseconds)
+SETTINGS_POLL_INTERVAL = 1000
+# From this block (23:50) the next day's plan is prefetched
+PREFETCH_BLOCK = 143
+
+
+# Return True if the autosaved plan was saved today
+def autosave_is_today():
+    return os.path.isfile(AUTOSAVE_FILENAME) and datetime.fromtimestamp(os.path.getmtime(AUTOSAVE_FILENAME)).date() == date.today()
+
+
+# Return (plan to start with, saved plan filename if it is the only saved plan and was loaded), or (None, None)
+def load_startup_plan(saved_filenames):
+    """
+    Parameters:
+    -----------
+        saved_filenames : [str]
+            Files of the saved plans directory
+    """
+    if autosave_is_today():
+        return (read_saved_plan(AUTOSAVE_FILENAME), None)
+    day_plan = load_day_plan(date.today())
+    if day_plan is not None:
+        return (day_plan, None)
+    if len(saved_filenames)==1:
+        return (read_saved_plan("./saved_plans/" + saved_filenames[0]), saved_filenames[0])
+    return (None, None)
 
 
 class App:
     """Main Application for 144 Blocks"""
-    def __init__(self, master, block_size, activities, colour_settings):
+    def __init__(self, master, block_size, activities, colour_settings, settings_filename=None):
         """
         Parameters:
         -----------
@@ -37,6 +81,8 @@ class App:
                 Dictionary (key is the activity name) of dictionaries containing the various activity details
             colour_settings : [col_txt_primary, col_txt_secondary, col_bg, col_fg, col_unlinked]
                 List of colour appearance settings
+            settings_filename : str or None
+                Settings file to watch for changes, which are applied without restarting
         """
         
         self.master = master
@@ -45,10 +91,42 @@ class App:
         [self.col_txt_primary, self.col_txt_secondary, self.col_bg, self.col_fg, self.col_unlinked]  = colour_settings       
         self.img_blank_block = tk.PhotoImage(master=self.master,width=self.block_size,height=self.block_size)
 
-        # link between activity and block: value is '-1' if unlinked, or the name of the activity
-        self.block_linking = [['-1' for _ in range(6)] for _ in range(24)]
-
-        configure_window(master=self.master, title="144 Blocks", width=170, height=610, resizable=True, centred=False, bg=self.col_bg)
+        # persistent tune player, started with time mode
+        self.audio_worker = None
+        self.tune_settings = DEFAULT_TUNE_SETTINGS
+
+        # link between activity and block: block_linking[row][col] is '-1' if unlinked, or the name of the activity,
+        # stored as small integer activity ids (see block_grid)
+        self.activity_table = ActivityTable(self.acts)
+        self.block_linking = BlockGrid(self.activity_table)
+        self.update_productive_mask()
+        self.journal = UndoJournal()
+        self.wal = PlanWAL()
+        self.autosaver = AutoSaver(wal=self.wal)
+
+        # time mode wakes up only when a block becomes past, and plays a tune when the activity changes
+        self.scheduler = TransitionScheduler(self.master)
+        self.scheduler.subscribe(on_start=self.activity_started)
+        self.frontier = 0 # number of blocks shown as past
+        self.num_blocks = 0 # number of blocks completed at the last timer update
+        self.day = datetime.now().date() # day of the current plan, checked at midnight in both modes
+        self.archive_lock = threading.Lock()
+        self.prefetcher = PlanPrefetcher(self.activity_table)
+
+        # While the window is iconified or hidden, widget updates are deferred and applied once it is shown again
+        self.visible = True
+        self.dirty_blocks = set()
+        self.master.bind("<Map>", lambda event: self.set_visible(event, True))
+        self.master.bind("<Unmap>", lambda event: self.set_visible(event, False))
+
+        # current block, activity and counters, published for external status bars
+        try:
+            self.status = StatusWriter()
+        except (OSError, ValueError) as err:
+            print("Could not publish the status: " + str(err))
+            self.status = None
+
+        configure_window(master=self.master, title="144 Blocks", width=170, height=625, resizable=True, centred=False, bg=self.col_bg)
 
         block_frame = tk.Frame(self.master, borderwidth=1, bg=self.col_bg)
         for i in range(7):
@@ -82,8 +160,11 @@ class App:
         self.counter_label = tk.Label(self.master, bg=self.col_bg, fg=self.col_txt_primary, textvariable=self.counter_var)
         self.counter_label.pack()
         
-        # Settings button
-        tk.Button(self.master, text="Settings", bg=self.col_fg, activebackground=self.col_fg, activeforeground=self.col_txt_primary, fg=self.col_txt_primary, command=self.display_save_load_window).pack(pady=10)
+        # Settings and year view buttons
+        button_frame = tk.Frame(self.master, bg=self.col_bg)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="Settings", bg=self.col_fg, activebackground=self.col_fg, activeforeground=self.col_txt_primary, fg=self.col_txt_primary, command=self.display_save_load_window).pack(side=tk.LEFT, padx=2)
+        tk.Button(button_frame, text="Year", bg=self.col_fg, activebackground=self.col_fg, activeforeground=self.col_txt_primary, fg=self.col_txt_primary, command=self.display_year_window).pack(side=tk.LEFT, padx=2)
 
         # Edit checkbox
         self.check_var = tk.IntVar(self.master)
@@ -92,65 +173,260 @@ class App:
         cb.pack()
         cb.select()
 
-        # Load saved plans if available
+        # Undo/redo block edits
+        self.master.bind("<Control-z>", lambda event: self.undo())
+        self.master.bind("<Control-y>", lambda event: self.redo())
+        self.master.bind("<Control-Z>", lambda event: self.redo())
+
+        # Restore today's autosaved plan, otherwise load today's plan (or weekday template) or saved plans if available
         savedFilenamesOptions = os.listdir("./saved_plans/")
-        if len(savedFilenamesOptions)==1:
-            saved_filename = "./saved_plans/" + savedFilenamesOptions[0]
-            self.block_linking = read_saved_plan(saved_filename)
+        if os.path.isfile(AUTOSAVE_FILENAME) and not autosave_is_today():
+            self.archive_autosave()
+        (startup_plan, loaded_filename) = load_startup_plan(savedFilenamesOptions)
+        if startup_plan is not None:
+            self.block_linking = self.plan_grid(startup_plan)
             self.update_block_edit_display(self.block_linking, self.acts)
-            messagebox.showinfo("Loaded Plan","Loaded " + savedFilenamesOptions[0])
-        elif len(savedFilenamesOptions)==0:
-            pass
+            if loaded_filename is not None:
+                from tkinter import messagebox
+                messagebox.showinfo("Loaded Plan","Loaded " + loaded_filename)
+        elif len(savedFilenamesOptions)>1:
+            # opened once the main loop runs: its nested main loop would only return when the application closes
+            self.master.after(0, self.display_save_load_window)
+
+        # Replay today's edits that were logged after the last autosave
+        if self.wal.is_from_today():
+            for (index, activity) in self.wal.replay():
+                (row, col) = divmod(index, 6)
+                self.block_linking[row][col] = activity if activity in self.acts else '-1'
+            self.update_block_edit_display(self.block_linking, self.acts)
+            self.autosaver.schedule(self.block_linking, self.wal.offset)
         else:
-            self.display_save_load_window()
+            self.wal.clear()
+
+        self.settings_filename = settings_filename
+        if self.settings_filename is not None:
+            (_, _, self.act_settings, self.tune_settings) = load_settings_data(self.settings_filename)
+            self.settings_stat = self.stat_settings_file()
+            self.settings_timer = self.master.after(SETTINGS_POLL_INTERVAL, self.watch_settings_file)
+
+        self.update_productive_mask()
+        self.write_snapshot()
+        self.status_update_function()
+        self.day_update_function()
+
+    # Return the BlockGrid of a plan, unlinking blocks of activities that are not in the settings (e.g. removed since)
+    def plan_grid(self, block_linking):
+        return BlockGrid(self.activity_table, [[act if act in self.acts else '-1' for act in row] for row in block_linking])
 
     # Update the block colours and icons for editing mode
     def update_block_edit_display(self, block_linking, acts):
-        for row in range(24):
-            for col in range(6):
-                if block_linking[row][col] == '-1':
-                    btncolour=self.col_unlinked
-                    btnimg=self.img_blank_block
-                else:
-                    btncolour=acts[block_linking[row][col]]['colour']
-                    btnimg=acts[block_linking[row][col]]['icon']
+        names = block_linking.table.names
+        for index, act_id in enumerate(block_linking.ids):
+            if act_id == UNLINKED_ID:
+                btncolour=self.col_unlinked
+                btnimg=self.img_blank_block
+            else:
+                btncolour=acts[names[act_id]]['colour']
+                btnimg=acts[names[act_id]]['icon']
 
-                self.btn[row][col].config(bg=btncolour, activebackground=btncolour, image=btnimg)
+            self.btn[index//6][index%6].config(bg=btncolour, activebackground=btncolour, image=btnimg)
 
     # Update the block colours and icons for time mode (black blocks indicate past activity)
     def update_block_time_display(self, block_linking, acts):
         num_blocks = self.curBlocks()
+        names = block_linking.table.names
         changed = False
-        for row in range(24):
-            for col in range(6):
-                if row*6+col+1 <= num_blocks:
-                    btncolour='#000000'
-                    btnimg=self.img_blank_block
-                else:
-                    if block_linking[row][col] == '-1':
-                        btncolour=self.col_unlinked
-                        btnimg=self.img_blank_block
-                    else:
-                        btncolour=acts[block_linking[row][col]]['colour']
-                        btnimg=acts[block_linking[row][col]]['icon']
-                if self.btn[row][col].cget('bg') != btncolour:
-                    changed = True
-                    self.btn[row][col].config(bg=btncolour, activebackground=btncolour, image=btnimg)
+        for index, act_id in enumerate(block_linking.ids):
+            if index < num_blocks:
+                btncolour='#000000'
+                btnimg=self.img_blank_block
+            elif act_id == UNLINKED_ID:
+                btncolour=self.col_unlinked
+                btnimg=self.img_blank_block
+            else:
+                btncolour=acts[names[act_id]]['colour']
+                btnimg=acts[names[act_id]]['icon']
+            btn = self.btn[index//6][index%6]
+            if btn.cget('bg') != btncolour:
+                changed = True
+                btn.config(bg=btncolour, activebackground=btncolour, image=btnimg)
         return changed
 
-    # Update the productive activity counter
+    # Return the colour and image currently shown for a block
+    def block_appearance(self, row, col, num_blocks=None):
+        if num_blocks is not None and row*6+col+1 <= num_blocks:
+            return ('#000000', self.img_blank_block)
+        act_id = self.block_linking.ids[row*6+col]
+        if act_id == UNLINKED_ID:
+            return (self.col_unlinked, self.img_blank_block)
+        act = self.acts[self.activity_table.names[act_id]]
+        return (act['colour'], act['icon'])
+
+    # Repaint only the given (row, col) blocks, in the current display mode
+    def refresh_blocks(self, blocks):
+        if not self.visible:
+            self.dirty_blocks.update(blocks)
+            return
+        num_blocks = None if self.check_var.get() == 1 else self.curBlocks()
+        for (row, col) in blocks:
+            (btncolour, btnimg) = self.block_appearance(row, col, num_blocks)
+            self.btn[row][col].config(bg=btncolour, activebackground=btncolour, image=btnimg)
+
+    # Link blocks to activities and repaint only the blocks that changed
+    def set_blocks(self, changes, record=True):
+        """
+        Parameters:
+        -----------
+            changes : {(row, col) : str}
+                New activity name (or '-1' for unlinked) for each block
+            record : bool
+                Record the change in the undo journal
+        """
+        ids = self.block_linking.ids
+        deltas = [] # (block index, old activity id, new activity id)
+        for (row, col), activity in changes.items():
+            act_id = self.activity_table.id_of(activity) if activity in self.acts else UNLINKED_ID
+            if ids[row*6+col] != act_id:
+                deltas.append((row*6+col, ids[row*6+col], act_id))
+                ids[row*6+col] = act_id
+                self.productive_index.set(row*6+col, self.productive_lookup[act_id])
+
+        if record:
+            self.journal.record(deltas)
+        self.log_changes(deltas)
+        if len(deltas) > 0:
+            self.publish_status()
+            self.write_snapshot()
+        self.refresh_blocks([divmod(index, 6) for (index, _, _) in deltas])
+        if self.check_var.get() == 0 and len(deltas) > 0:
+            self.update_productive_display()
+            self.schedule_transitions()
+        return deltas
+
+    # Log block changes [(block index, old id, new id)] to the write-ahead log, and schedule an autosave
+    def log_changes(self, deltas):
+        if len(deltas) == 0:
+            return
+        names = self.activity_table.names
+        if self.wal.append([(index, names[new]) for (index, _, new) in deltas]):
+            self.autosaver.schedule(self.block_linking, self.wal.offset)
+        else:
+            # activity name too long to log: save the whole plan now instead (it covers every logged edit too)
+            self.autosaver.schedule(self.block_linking, self.wal.offset)
+            self.autosaver.flush()
+
+    # Replace the whole plan, e.g. when a saved plan is loaded
+    def load_plan(self, block_linking):
+        self.set_blocks({(row, col): block_linking[row][col] for row in range(24) for col in range(6)})
+
+    # Apply journal deltas [(block index, old id, new id)] without recording them
+    def apply_deltas(self, deltas):
+        if deltas is not None:
+            names = self.activity_table.names
+            self.set_blocks({divmod(index, 6): names[new] for (index, _, new) in deltas}, record=False)
+
+    # Undo the last block edit
+    def undo(self):
+        self.apply_deltas(self.journal.undo())
+
+    # Redo the last undone block edit
+    def redo(self):
+        self.apply_deltas(self.journal.redo())
+
+    # Return (size, mtime) of the settings file, or None if it is missing
+    def stat_settings_file(self):
+        try:
+            stat = os.stat(self.settings_filename)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    # Poll the settings file, and apply any changes to the running application
+    def watch_settings_file(self):
+        cur_stat = self.stat_settings_file()
+        if cur_stat is not None and cur_stat != self.settings_stat:
+            self.settings_stat = cur_stat
+            try:
+                self.reload_settings()
+            except Exception as err: # e.g. a half-written or invalid settings file
+                print("Could not reload " + self.settings_filename + ": " + str(err))
+        self.settings_timer = self.master.after(SETTINGS_POLL_INTERVAL, self.watch_settings_file)
+
+    # Apply a changed settings file, re-creating only the icons and repainting only the blocks that changed
+    def reload_settings(self):
+        (colour_settings, block_size, act_settings, self.tune_settings) = load_settings_data(self.settings_filename)
+        if self.audio_worker is not None:
+            self.audio_worker.set_tune_settings(self.tune_settings)
+        changed_acts = set()
+
+        # A new block size means every icon was resized
+        size_changed = block_size != self.block_size
+        if size_changed:
+            self.block_size = block_size
+            self.img_blank_block = tk.PhotoImage(master=self.master, width=block_size, height=block_size)
+            self.acts['-1']['icon'] = tk.PhotoImage(master=self.master, width=block_size, height=block_size)
+            changed_acts.add('-1')
+        if colour_settings[4] != self.col_unlinked:
+            self.acts['-1']['colour'] = colour_settings[4]
+            changed_acts.add('-1')
+        # Appearance colours apply to newly opened windows
+        [self.col_txt_primary, self.col_txt_secondary, self.col_bg, self.col_fg, self.col_unlinked] = colour_settings
+
+        for act in list(self.act_settings):
+            if act not in act_settings:
+                del self.acts[act]
+                changed_acts.add(act)
+        for act, new in act_settings.items():
+            old = self.act_settings.get(act)
+            if old is None or old['source'] != new['source'] or size_changed:
+                self.acts[act] = {'icon':tk.PhotoImage(master=self.master, file=new['icon']), 'colour':new['colour'], 'productive':new['productive']}
+                changed_acts.add(act)
+                continue
+            if old['colour'] != new['colour']:
+                self.acts[act]['colour'] = new['colour']
+                changed_acts.add(act)
+            self.acts[act]['productive'] = new['productive']
+        self.act_settings = act_settings
+
+        # Blocks linked to a removed activity become unlinked
+        changed_ids = {self.activity_table.id_of(act) for act in changed_acts}
+        removed_ids = {act_id for act_id, act in enumerate(self.activity_table.names) if act not in self.acts}
+        ids = self.block_linking.ids
+        changed_blocks = []
+        unlinked = []
+        for index, act_id in enumerate(ids):
+            if act_id in changed_ids:
+                changed_blocks.append(divmod(index, 6))
+            if act_id in removed_ids:
+                unlinked.append((index, act_id, UNLINKED_ID))
+                ids[index] = UNLINKED_ID
+        self.log_changes(unlinked)
+        self.refresh_blocks(changed_blocks)
+        self.update_productive_mask()
+        self.publish_status()
+        self.write_snapshot()
+
+        if self.check_var.get() == 0:
+            self.update_productive_display()
+            self.schedule_transitions()
+
+    # Recompute which activities and blocks are productive, after the plan or the settings are replaced
+    def update_productive_mask(self):
+        self.productive_lookup = self.activity_table.productive_lookup(self.acts)
+        self.productive_index = ProductiveIndex(self.block_linking.productive_mask(self.productive_lookup))
+
+    # Update the productive activity counter, with the blocks left and when the next productive block starts
     def update_productive_display(self):
+        if not self.visible:
+            return # updated when the window is shown again
         num_blocks = self.curBlocks()
-        total_count = 0
-        current_elapsed_count = 0
-        for row in range(24):
-            for col in range(6):
-                if self.acts[self.block_linking[row][col]]['productive'] == "True":
-                    total_count += 1
-                    if row*6+col+1 <= num_blocks:
-                        current_elapsed_count += 1
+        total_count = self.productive_index.total()
+        current_elapsed_count = self.productive_index.elapsed(num_blocks)
+        remaining_count = self.productive_index.remaining(num_blocks)
+        next_block = self.productive_index.next_productive(num_blocks + 1) # after the current block
+        next_text = "-" if next_block is None else ProductiveIndex.start_time(next_block)
 
-        self.counter_var.set(str(current_elapsed_count) + "/" + str(total_count))
+        self.counter_var.set(str(current_elapsed_count) + "/" + str(total_count) + " (" + str(remaining_count) + " left)\nNext: " + next_text)
 
     # Show the window for changing a blocks linked activity
     def display_activity_options_window(self, row, col):
@@ -173,44 +449,191 @@ class App:
 
         save_load_root.mainloop()
     
+    # Show the year at a glance view of the plan history
+    def display_year_window(self):
+        # imported before the window is created, so a missing NumPy or Pillow doesn't leave an empty window
+        try:
+            from heatmap import YearHeatmap
+        except ImportError as err:
+            from tkinter import messagebox
+            messagebox.showerror("Year", "The year view needs NumPy and Pillow: " + str(err))
+            return
+        year_heatmap = YearHeatmap(self.acts, self.col_unlinked, self.col_bg)
+        year_root = tk.Tk()
+
+        year_view = Year_View_Window(year_root,
+        [self.col_txt_primary, self.col_txt_secondary, self.col_bg, self.col_fg, self.col_unlinked],
+        year_heatmap)
+
+        year_root.mainloop()
+
     # Toggle between editing mode and time mode
     def toggle_display_setting(self):
         if self.check_var.get() == 1:
-            if hasattr(self, 'cur_timer'):
-                self.master.after_cancel(self.cur_timer)
+            self.scheduler.cancel('frontier')
+            self.scheduler.cancel('transition')
             self.counter_label.config(fg=self.col_bg) # hidden
             self.update_block_edit_display(self.block_linking, self.acts)
         else:
             self.counter_label.config(fg=self.col_txt_primary) # show
-            self.timer_update_function(do_play_tune=False)
+            self.start_audio_worker()
+            self.check_new_day() # before the frontier is reset, which would hide the change of day
+            self.update_block_time_display(self.block_linking, self.acts)
+            self.frontier = self.num_blocks = self.curBlocks()
+            self.schedule_transitions()
+            self.timer_update_function()
     
-    # Timer function for updating the blocks when in time mode
-    def timer_update_function(self, do_play_tune=True):
+    # Timer function for time mode, run when a block becomes past. It is stopped while the window is hidden
+    def timer_update_function(self):
+        self.check_new_day()
+        num_blocks = self.curBlocks()
+        self.num_blocks = num_blocks
+        self.scheduler.cancel('frontier')
+        if self.visible:
+            self.update_time_display()
+            self.scheduler.call_at(block_start(num_blocks + 1), self.timer_update_function, 'frontier')
+
+    # Timer function for both modes, run when a block starts: publish the new current block for status bars
+    def status_update_function(self):
+        if self.status is None:
+            return
+        self.publish_status()
+        self.scheduler.cancel('status')
+        self.scheduler.call_at(block_start(self.curBlocks() + 1), self.status_update_function, 'status')
+
+    # Timer function for both modes, run when the next day's plan is prefetched and at midnight
+    def day_update_function(self):
+        self.check_new_day()
+        if self.curBlocks() >= PREFETCH_BLOCK:
+            self.prefetcher.start(self.day + timedelta(days=1), self.acts, self.productive_lookup)
+            when = block_start(144) # midnight
+        else:
+            when = block_start(PREFETCH_BLOCK)
+        self.scheduler.cancel('day')
+        self.scheduler.call_at(when, self.day_update_function, 'day')
+
+    # On a new day, archive the previous day's plan and swap in the new day's plan
+    def check_new_day(self):
+        today = datetime.now().date()
+        if today == self.day:
+            return
+        # in the background, as archive_autosave does: the index update imports NumPy and rewrites the index file
+        threading.Thread(target=self.archive_plan, args=(self.day, self.block_linking.to_lists()), name="archive", daemon=True).start()
+        self.day = today
+        deltas = self.start_new_day()
+        if self.check_var.get() == 1:
+            self.refresh_blocks([divmod(index, 6) for (index, _, _) in deltas])
+        else:
+            self.schedule_transitions()
+        self.publish_status()
+
+    # Archive the plan of a day in the history, and add it to the history index. Runs in a background thread
+    def archive_plan(self, day, block_linking):
+        with self.archive_lock: # one update of the history index at a time
+            try:
+                archive_day_plan(day, block_linking)
+                try:
+                    from history_index import index_archived_day
+                except ImportError: # NumPy is optional: the index catches up with the history when it is next loaded
+                    return
+                index_archived_day(day, block_linking)
+            except (OSError, ValueError) as err:
+                print("Could not archive the plan of " + day.isoformat() + ": " + str(err))
+
+    # Archive the autosaved plan of a previous day (the application wasn't running at midnight), in the background
+    def archive_autosave(self):
+        day = date.fromtimestamp(os.path.getmtime(AUTOSAVE_FILENAME))
+        if os.path.isfile(history_filename(day)):
+            return
+        # read now, before the next autosave replaces the file
+        with open(AUTOSAVE_FILENAME, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        threading.Thread(target=lambda: self.archive_plan(day, read_saved_plan(lines)), name="archive", daemon=True).start()
+
+    # Swap in the plan of the new day, if it has one (otherwise the same plan carries on); return the block changes
+    def start_new_day(self):
+        prefetched = self.prefetcher.take(self.day, self.acts, self.productive_lookup)
+        if prefetched is None:
+            return []
+        new_ids = prefetched.grid.ids
+        # activities removed since the prefetch become unlinked
+        names = self.activity_table.names
+        stale = [index for index, act_id in enumerate(new_ids) if names[act_id] not in self.acts]
+        for index in stale:
+            new_ids[index] = UNLINKED_ID
+
+        ids = self.block_linking.ids
+        deltas = [(index, ids[index], act_id) for index, act_id in enumerate(new_ids) if ids[index] != act_id]
+        ids[:] = new_ids
+        if len(stale) == 0 and prefetched.productive_lookup == self.productive_lookup:
+            self.productive_index = prefetched.productive_index
+        else:
+            self.update_productive_mask()
+        self.journal.record(deltas)
+        self.log_changes(deltas)
+        self.write_snapshot()
+        return deltas
+
+    # Black out the blocks that became past since the last update (all blocks on a new day), and update the counter
+    def update_time_display(self):
+        if self.num_blocks < self.frontier:
+            self.update_block_time_display(self.block_linking, self.acts)
+        else:
+            self.refresh_blocks([divmod(index, 6) for index in range(self.frontier, self.num_blocks)])
+        self.frontier = self.num_blocks
         self.update_productive_display()
-        
-        if self.update_block_time_display(self.block_linking, self.acts) and do_play_tune:
-            self.play_tune()
-        
-        cur_minute = datetime.now().time().minute
-        cur_second = datetime.now().time().second
-        time_delay = int((10-cur_minute%10)*60 -60 + (60-cur_second) +1)
-        if time_delay <= 0:
-            time_delay = 1
 
-        self.cur_timer = self.master.after(time_delay*1000, self.timer_update_function)
+    # Track whether the main window is shown; once shown again, apply the deferred updates in one repaint
+    def set_visible(self, event, visible):
+        if event.widget is not self.master or visible == self.visible:
+            return
+        self.visible = visible
+        if visible:
+            (blocks, self.dirty_blocks) = (self.dirty_blocks, set())
+            self.refresh_blocks(blocks)
+            if self.check_var.get() == 0:
+                self.timer_update_function() # repaints the blocks that became past, and re-arms the timer
+        elif self.check_var.get() == 0:
+            # nothing to show until the window is shown again; the transition, day and status timers carry on
+            self.scheduler.cancel('frontier')
+
+    # Publish the current block, activity and productive counters to the status file
+    def publish_status(self):
+        if self.status is None:
+            return
+        num_blocks = self.curBlocks()
+        self.status.publish(num_blocks, self.activity_table.names[self.block_linking.ids[num_blocks]],
+                            self.productive_index.elapsed(num_blocks), self.productive_index.total(),
+                            self.productive_index.remaining(num_blocks), self.productive_index.next_productive(num_blocks + 1))
+
+    # Write the plan snapshot read by the status command
+    def write_snapshot(self):
+        try:
+            write_plan_snapshot(self.block_linking.ids, self.activity_table.names, self.productive_lookup)
+        except OSError as err:
+            print("Could not write the plan snapshot: " + str(err))
+
+    # Schedule the activity transitions left today
+    def schedule_transitions(self):
+        names = self.activity_table.names
+        self.scheduler.cancel('transition')
+        self.scheduler.schedule_transitions([(index, names[old], names[new]) for (index, old, new) in compile_transitions(self.block_linking.ids)],
+                                            self.curBlocks())
+
+    # Called when a new activity starts in time mode
+    def activity_started(self, activity):
+        self.play_tune()
 
     # Play random tune from 'tunes' directory
     def play_tune(self):
-        tune_options = []
-        for filename in os.listdir("./tunes/"):
-            if filename.endswith(".mp3") or filename.endswith(".wav"):
-                tune_options.append(filename)
-        
-        if len(tune_options)==0:
-            return
-        else:
-            tune_filename = "./tunes/" + random.choice(tune_options)
-        subprocess.call(["ffplay", "-loglevel", "panic", "-nodisp", "-autoexit", tune_filename])
+        self.start_audio_worker()
+        self.audio_worker.play_random_tune()
+
+    # Start the persistent audio player, which decodes the tunes in the background
+    def start_audio_worker(self):
+        if self.audio_worker is None:
+            from audio_worker import AudioWorker
+            self.audio_worker = AudioWorker("./tunes/", self.tune_settings)
 
     # Return number of blocks completed today
     def curBlocks(self):
@@ -268,10 +691,7 @@ class Activity_Options_Window:
     # Change activity linked to the current block
     def buttonOK(self, app_obj):
         chosen_option = self.var_options.get()
-        chosen_colour = acts[chosen_option]['colour']
-        chosen_image = acts[chosen_option]['icon']
-        app_obj.block_linking[self.row][self.col] = chosen_option
-        self.btn[self.row][self.col].config(bg=chosen_colour, activebackground=chosen_colour, image=chosen_image)
+        app_obj.set_blocks({(self.row, self.col): chosen_option})
 
         self.master.destroy()
 
@@ -285,7 +705,7 @@ class Save_Load_Window:
         [self.col_txt_primary, self.col_txt_secondary, self.col_bg, self.col_fg, self.col_unlinked]  = colour_settings
         self.btn = app_obj.btn
 
-        configure_window(self.master,"Save/Load",300,150,False,False,self.col_bg)
+        configure_window(self.master,"Save/Load",300,180,False,False,self.col_bg)
 
         # Option menu of saved plans
         load_options = os.listdir("./saved_plans/")
@@ -296,6 +716,12 @@ class Save_Load_Window:
             option = tk.OptionMenu(*_args)
             option.pack(padx=20)
 
+            # Preview of the selected plan, one rectangle per run of the same activity
+            self.preview = tk.Canvas(self.master, width=288, height=20, bg=self.col_bg, highlightthickness=0)
+            self.preview.pack(pady=2)
+            self.var_options.trace_add('write', lambda *args: self.preview_plan(app_obj))
+            self.preview_plan(app_obj)
+
             # Load saved plan button
             btnLoad = tk.Button(self.master, text="Load", bg='#66ff66', activebackground='#66ff66', command=lambda: self.buttonLoad(app_obj))
             btnLoad.pack(padx=20,pady=2)
@@ -309,23 +735,17 @@ class Save_Load_Window:
         saveFilenameEntry = tk.Entry(self.master, font=("Courier",12), textvariable=self.var_save_name)
         saveFilenameEntry.pack(side=tk.BOTTOM)
 
+    # Draw the selected plan in the preview
+    def preview_plan(self, app_obj):
+        runs = plan_runs(read_saved_plan("./saved_plans/" + self.var_options.get()))
+        draw_runs(self.preview, runs, {act: app_obj.acts[act]['colour'] for act in app_obj.acts}, block_width=2, height=20)
+
     # Load the selected plan
     def buttonLoad(self, app_obj):
         chosen_option = self.var_options.get()
         filename_to_load = "./saved_plans/" +chosen_option
         
-        app_obj.block_linking = read_saved_plan(filename_to_load)
-
-        for row in range(24):
-            for col in range(6):
-                if app_obj.block_linking[row][col] == '-1':
-                    btncolour=app_obj.col_unlinked
-                    btnimg=tk.PhotoImage(width=block_size,height=block_size)
-                else:
-                    btncolour=acts[app_obj.block_linking[row][col]]['colour']
-                    btnimg=acts[app_obj.block_linking[row][col]]['icon']
-
-                self.btn[row][col].config(bg=btncolour, activebackground=btncolour, image=btnimg)
+        app_obj.load_plan(read_saved_plan(filename_to_load))
         
         self.master.destroy()
     
@@ -335,6 +755,62 @@ class Save_Load_Window:
         self.master.destroy()
 
 
+class Year_View_Window:
+    """Year at a glance heatmap of the plan history for 144 Blocks"""
+    def __init__(self, master, colour_settings, year_heatmap):
+        """
+        Parameters:
+        -----------
+            master : Tk object
+            colour_settings : [col_txt_primary, col_txt_secondary, col_bg, col_fg, col_unlinked]
+                List of colour appearance settings
+            year_heatmap : heatmap.YearHeatmap
+                Month tiles of the history, for the activities of the application
+        """
+        from heatmap import CELL_HEIGHT
+
+        self.master = master
+        [self.col_txt_primary, self.col_txt_secondary, self.col_bg, self.col_fg, self.col_unlinked]  = colour_settings
+        self.heatmap = year_heatmap
+        self.year = datetime.now().year
+
+        configure_window(self.master,"Year",760,400,False,False,self.col_bg)
+
+        # Year selection and colouring
+        control_frame = tk.Frame(self.master, bg=self.col_bg)
+        control_frame.pack(pady=5)
+        tk.Button(control_frame, text="<", bg=self.col_fg, activebackground=self.col_fg, fg=self.col_txt_secondary, command=lambda: self.change_year(-1)).pack(side=tk.LEFT)
+        self.var_year = tk.StringVar(self.master)
+        tk.Label(control_frame, textvariable=self.var_year, bg=self.col_bg, fg=self.col_txt_secondary, width=6).pack(side=tk.LEFT)
+        tk.Button(control_frame, text=">", bg=self.col_fg, activebackground=self.col_fg, fg=self.col_txt_secondary, command=lambda: self.change_year(1)).pack(side=tk.LEFT)
+        self.var_mode = tk.StringVar(self.master)
+        self.var_mode.set('activity')
+        for mode in ('activity', 'productive'):
+            tk.Radiobutton(control_frame, text=mode.capitalize(), variable=self.var_mode, value=mode, command=self.draw,
+            bg=self.col_bg, activebackground=self.col_bg, fg=self.col_txt_secondary, selectcolor=self.col_fg).pack(side=tk.LEFT, padx=5)
+
+        # Heatmap: one column per day, one row per block, with month labels above
+        self.canvas = tk.Canvas(self.master, width=740, height=144*CELL_HEIGHT+20, bg=self.col_bg, highlightthickness=0)
+        self.canvas.pack()
+        self.draw()
+
+    # Draw the heatmap of the selected year
+    def draw(self):
+        from PIL import ImageTk
+
+        self.var_year.set(str(self.year))
+        (image, offsets) = self.heatmap.year_image(self.year, self.var_mode.get())
+        self.photo = ImageTk.PhotoImage(image, master=self.master) # keep a reference, or Tk drops the image
+        self.canvas.delete('all')
+        for month, x in enumerate(offsets, 1):
+            self.canvas.create_text(5+x, 10, text=datetime(self.year, month, 1).strftime("%b"), fill=self.col_txt_secondary, anchor=tk.W)
+        self.canvas.create_image(5, 20, image=self.photo, anchor=tk.NW)
+
+    def change_year(self, step):
+        self.year += step
+        self.draw()
+
+
 if __name__ == "__main__":
     root = tk.Tk()
 
@@ -348,6 +824,6 @@ if __name__ == "__main__":
         (colour_arr, block_size, acts) = read_settings_file(settings_filename, root)    
         [col_txt_primary, col_txt_secondary, col_bg, col_fg, col_unlinked]  = colour_arr
 
-    app = App(root, block_size, acts, colour_arr)
+    app = App(root, block_size, acts, colour_arr, settings_filename)
 
     root.mainloop()
@@ -0,0 +1,192 @@
+"""
+Long-lived audio worker for playing the tunes
+
+Instead of starting a new ffplay process for every tune, a single ffplay
+process is kept running (holding the audio device open) and fed raw PCM
+through its stdin pipe. Tunes are decoded to PCM once, in the worker thread,
+so playing a tune only means writing already decoded samples to the pipe.
+
+Tunes are normalised to the same loudness while decoding, and tunes longer
+than the configured limit are skipped, using the cached analysis from
+tune_analysis.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import atexit
+import os
+import queue
+import random
+import subprocess
+import threading
+
+from tune_analysis import TuneAnalysis
+
+# Raw PCM format used between the decoder and the player
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2 # bytes, signed 16-bit little endian
+PCM_FORMAT = ["-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS)]
+
+# PCM is written to the player in chunks of this many bytes
+CHUNK_SIZE = 16384
+
+TUNE_EXTENSIONS = (".mp3", ".wav")
+
+# Command to play a random tune
+RANDOM_TUNE = object()
+
+
+class AudioWorker:
+    """Background thread owning a persistent ffplay process, which plays decoded tunes on command"""
+    def __init__(self, tunes_dir, tune_settings):
+        """
+        Parameters:
+        -----------
+            tunes_dir : str
+                Directory of tunes to decode in advance
+            tune_settings : {max_length : float,
+                             target_loudness : float}
+                Longest tune to play (seconds, 0 for no limit), and mean volume (dB) to normalise tunes to
+        """
+        self.tunes_dir = tunes_dir
+        self.tune_settings = tune_settings
+        self.analysis = None
+        self.pcm = {} # tune filename -> (gain in dB, decoded PCM bytes)
+        self.player = None
+        self.commands = queue.Queue()
+
+        self.thread = threading.Thread(target=self.run, name="audio-worker", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    # Queue a tune to be played (returns immediately)
+    def play(self, tune_filename):
+        self.commands.put(tune_filename)
+
+    # Queue a random tune, from those within the length limit, to be played
+    def play_random_tune(self):
+        self.commands.put(RANDOM_TUNE)
+
+    # Use new tune settings (e.g. after the settings file changed), from the next command on
+    def set_tune_settings(self, tune_settings):
+        self.commands.put(dict(tune_settings))
+
+    # Stop the worker thread and the player process
+    def close(self):
+        self.commands.put(None)
+        self.thread.join(timeout=1)
+        if self.player is not None and self.player.poll() is None:
+            self.player.terminate()
+
+    # Worker thread: start the player, decode the tunes, then play tunes as they are requested
+    def run(self):
+        self.analysis = TuneAnalysis()
+        self.player = self.start_player()
+
+        for tune_filename in self.tune_filenames():
+            if self.commands.empty() and self.within_length_limit(tune_filename):
+                self.decode(tune_filename)
+
+        while True:
+            tune_filename = self.commands.get()
+            if tune_filename is None:
+                break
+            if isinstance(tune_filename, dict): # new tune settings
+                self.apply_tune_settings(tune_filename)
+                continue
+            if tune_filename is RANDOM_TUNE:
+                tune_options = [f for f in self.tune_filenames() if self.within_length_limit(f)]
+                if len(tune_options)==0:
+                    continue
+                tune_filename = random.choice(tune_options)
+            self.write_tune(tune_filename)
+
+        if self.player is not None:
+            try:
+                self.player.stdin.close()
+            except OSError:
+                pass
+
+    # Worker thread: switch to new tune settings, dropping the decoded PCM of tunes now over the length limit
+    def apply_tune_settings(self, tune_settings):
+        self.tune_settings = tune_settings
+        for tune_filename in [f for f in self.pcm if not self.within_length_limit(f)]:
+            del self.pcm[tune_filename]
+
+    # Return the paths of the tunes in the tunes directory
+    def tune_filenames(self):
+        return [os.path.join(self.tunes_dir, filename) for filename in sorted(os.listdir(self.tunes_dir))
+                if filename.endswith(TUNE_EXTENSIONS)]
+
+    # Return False if a tune is known to be longer than the configured limit
+    def within_length_limit(self, tune_filename):
+        max_length = self.tune_settings['max_length']
+        analysis = self.analysis.get(tune_filename)
+        return max_length <= 0 or analysis is None or analysis[0] <= max_length
+
+    # Return the gain (dB) that brings a tune to the target loudness
+    def gain(self, tune_filename):
+        analysis = self.analysis.get(tune_filename)
+        if analysis is None:
+            return 0.0
+        return round(self.tune_settings['target_loudness'] - analysis[1], 1)
+
+    # Start ffplay reading raw PCM from its stdin, or return None if it can't be started
+    def start_player(self):
+        try:
+            player = subprocess.Popen(["ffplay", "-loglevel", "panic", "-nodisp", "-autoexit",
+                                       "-probesize", "32", "-analyzeduration", "0", "-fflags", "nobuffer"]
+                                      + PCM_FORMAT + ["-i", "pipe:0"],
+                                      stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            return None
+        # A little silence, so ffplay opens the audio device now rather than on the first tune
+        try:
+            player.stdin.write(bytes(SAMPLE_RATE // 10 * CHANNELS * SAMPLE_WIDTH))
+            player.stdin.flush()
+        except OSError: # ffplay exited already, e.g. no audio device
+            player.terminate()
+            return None
+        return player
+
+    # Return the decoded PCM of a tune, decoding it with ffmpeg the first time
+    def decode(self, tune_filename):
+        gain = self.gain(tune_filename)
+        # decoded again only if the target loudness changed
+        if tune_filename not in self.pcm or self.pcm[tune_filename][0] != gain:
+            try:
+                result = subprocess.run(["ffmpeg", "-loglevel", "panic", "-i", tune_filename, "-af", "volume={}dB".format(gain)]
+                                        + PCM_FORMAT + ["pipe:1"],
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+            except (OSError, subprocess.CalledProcessError):
+                return None
+            self.pcm[tune_filename] = (gain, result.stdout)
+        return self.pcm[tune_filename][1]
+
+    # Play a tune through the persistent player (restarting it if it exited), falling back to a one-off ffplay process
+    def write_tune(self, tune_filename):
+        if self.player is None or self.player.poll() is not None:
+            self.player = self.start_player()
+        pcm = self.decode(tune_filename) if self.player is not None else None
+        if pcm is not None:
+            pcm_view = memoryview(pcm)
+            try:
+                for start in range(0, len(pcm), CHUNK_SIZE):
+                    self.player.stdin.write(pcm_view[start:start+CHUNK_SIZE])
+                self.player.stdin.flush()
+                return
+            except OSError: # the player exited, it is restarted for the next tune
+                self.player = None
+        self.play_once(tune_filename)
+
+    # Play a tune with a one-off ffplay process
+    def play_once(self, tune_filename):
+        try:
+            subprocess.call(["ffplay", "-loglevel", "panic", "-nodisp", "-autoexit",
+                             "-af", "volume={}dB".format(self.gain(tune_filename)), tune_filename])
+        except OSError: # ffplay is not installed
+            pass
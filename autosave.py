@@ -0,0 +1,98 @@
+"""
+Write-behind autosave of the current plan
+
+Edits schedule a save rather than writing straight away: bursts of edits are
+coalesced into a single write once no edit has happened for a short delay.
+Writes happen in a background thread (never the Tk thread) and are atomic,
+so a crash leaves either the previous or the new plan on disk. Once a plan
+is written, the write-ahead log records it covers are compacted away.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import atexit
+import os
+import threading
+import time
+
+from read_write import write_plan_file
+
+AUTOSAVE_FILENAME = './cache/autosave.ini'
+
+
+class AutoSaver:
+    """Background thread saving the latest scheduled plan after a quiet period"""
+    def __init__(self, filename=AUTOSAVE_FILENAME, delay=2.0, wal=None):
+        """
+        Parameters:
+        -----------
+            filename : str
+                Path of the autosaved plan
+            delay : float
+                Seconds without edits before the plan is written
+            wal : PlanWAL or None
+                Write-ahead log to compact after each write
+        """
+        self.filename = filename
+        self.delay = delay
+        self.wal = wal
+        self.condition = threading.Condition()
+        self.pending = None # (version, plan, WAL offset) of the latest unsaved plan
+        self.due = None # time.monotonic() at which the pending plan is written
+        self.version = 0
+        # flush() and the worker thread may both write: only ever move forward
+        self.write_lock = threading.Lock()
+        self.written_version = 0
+
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    # Schedule a save of the plan, postponing any save already scheduled
+    def schedule(self, block_linking, wal_offset=None):
+        snapshot = [row[:] for row in block_linking]
+        with self.condition:
+            self.version += 1
+            self.pending = (self.version, snapshot, wal_offset)
+            self.due = time.monotonic() + self.delay
+            self.condition.notify()
+
+    # Write any pending plan now, from the calling thread
+    def flush(self):
+        with self.condition:
+            pending = self.pending
+            self.pending = None
+        if pending is not None:
+            self.write(*pending)
+
+    # Worker thread: wait until a scheduled plan is due, then write it
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None or time.monotonic() < self.due:
+                    timeout = None if self.pending is None else self.due - time.monotonic()
+                    self.condition.wait(timeout)
+                pending = self.pending
+                self.pending = None
+            self.write(*pending)
+
+    # Atomically write a plan, unless a newer one has already been written
+    def write(self, version, block_linking, wal_offset):
+        with self.write_lock:
+            if version <= self.written_version:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+                write_plan_file(self.filename, block_linking)
+            except OSError as err:
+                print("Could not autosave the plan: " + str(err))
+                return
+            self.written_version = version
+            if self.wal is not None and wal_offset is not None:
+                try:
+                    self.wal.compact(wal_offset)
+                except OSError as err: # the records are compacted with the next save
+                    print("Could not compact the write-ahead log: " + str(err))
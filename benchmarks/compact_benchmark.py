@@ -0,0 +1,69 @@
+"""
+Memory benchmark for compact configobj sections
+
+Keeps many plan-like configs (24 sections of 6 keys, as in saved_plans/)
+in memory, once as ConfigObj objects and once as their compact read-only
+copies, and compares the memory each set holds.
+
+Usage:
+    python3 benchmarks/compact_benchmark.py [--plans N]
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configobj import ConfigObj
+
+ACTIVITIES = ['Sleep', 'Work', 'Break', 'Planning', 'Exercise', 'Read', 'Eat', 'Shower', 'Movie', 'Hobby']
+
+
+# Return the lines of a random plan file
+def generate_plan(rng):
+    lines = []
+    for row in range(24):
+        lines.append('[' + str(row).zfill(2) + ']')
+        for col in range(6):
+            lines.append(str(col) + '0 = ' + rng.choice(ACTIVITIES))
+    return lines
+
+
+# Return the memory (bytes) held by the objects that load(plan) returns for every plan
+def measure(plans, load):
+    gc.collect()
+    tracemalloc.start()
+    loaded = [load(plan) for plan in plans]
+    gc.collect()
+    (current, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of ConfigObj and compact sections")
+    parser.add_argument("--plans", type=int, default=1000, help="number of plans held in memory")
+    args = parser.parse_args()
+
+    rng = random.Random(144)
+    plans = [generate_plan(rng) for _ in range(args.plans)]
+
+    default_bytes = measure(plans, ConfigObj)
+    compact_bytes = measure(plans, lambda plan: ConfigObj(plan).compact())
+
+    print("{} plans of 24 sections x 6 keys".format(args.plans))
+    print("ConfigObj:       {:8.1f} KiB ({:.0f} bytes per plan)".format(default_bytes / 1024, default_bytes / args.plans))
+    print("Compact section: {:8.1f} KiB ({:.0f} bytes per plan, {:.1f}x smaller)".format(
+        compact_bytes / 1024, compact_bytes / args.plans, default_bytes / compact_bytes))
+
+
+if __name__ == "__main__":
+    main()
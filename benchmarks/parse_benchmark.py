@@ -0,0 +1,121 @@
+"""
+Parsing benchmark for configobj
+
+Generates a large config file (sections, subsections, plain values, quoted
+values, lists, comments and multiline values), then checks that the fast
+parsing path produces exactly the same Section tree as the general parser
+before timing both.
+
+Usage:
+    python3 benchmarks/parse_benchmark.py [--lines N] [--repeat N]
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configobj import ConfigObj
+
+
+class ReferenceConfigObj(ConfigObj):
+    """ConfigObj with the fast path switched off, so every line uses the general parser"""
+    _simple_keyword = None
+    _simple_keyword_nolist = None
+
+
+# Plain ``key = value`` lines per subsection, as most lines of generated configs are
+SIMPLE_LINES = 30
+
+# Lines cycled through in each subsection, covering the value syntaxes
+VALUE_LINES = [
+    'key{0} = value{0}',
+    'key{0}=value {0} with spaces   ',
+    '    indented{0} = {0}',
+    'key with spaces {0} = x = {0}',
+    'quoted{0} = "a quoted value, with a comma"',
+    "'quoted key {0}' = 'single'",
+    'list{0} = a, b, {0}',
+    'single_list{0} = {0},',
+    'empty_list{0} = ,',
+    'commented{0} = value  # inline comment',
+    '# a full line comment {0}',
+    '',
+    'hash{0}key = v',
+    'url{0} = http://example.com/{0}?a=b',
+    'multi{0} = """first line',
+    'second line"""',
+    'triple{0} = \'\'\'one line\'\'\'',
+]
+
+
+# Return a list of about num_lines config lines
+def generate_config(num_lines):
+    lines = ['# initial comment', '']
+    section = 0
+    while len(lines) < num_lines:
+        lines.append('[section{}]'.format(section))
+        lines.append('top{} = {}'.format(section, section))
+        for subsection in range(3):
+            lines.append('    [[sub{}]]  # subsection comment'.format(subsection))
+            for i in range(SIMPLE_LINES):
+                lines.append('        simple{0} = {0}'.format(i))
+            for i, line in enumerate(VALUE_LINES):
+                lines.append(line.format(i))
+        section += 1
+    lines.append('# final comment')
+    return lines
+
+
+# Return a comparable representation of a Section tree, including round-trip metadata
+def section_state(section):
+    state = {
+        'scalars': [(key, dict.__getitem__(section, key)) for key in section.scalars],
+        'sections': [(key, section_state(section[key])) for key in section.sections],
+        'comments': section.comments,
+        'inline_comments': section.inline_comments,
+        'depth': section.depth,
+        'name': section.name,
+    }
+    if section is section.main:
+        state.update(initial_comment=section.initial_comment, final_comment=section.final_comment,
+                     indent_type=section.indent_type)
+    return state
+
+
+def time_parse(config_class, lines, repeat, **options):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        config_class(lines, **options)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the fast and general ConfigObj parsers")
+    parser.add_argument("--lines", type=int, default=200000, help="number of lines in the config")
+    parser.add_argument("--repeat", type=int, default=3, help="number of parses of each kind")
+    args = parser.parse_args()
+
+    lines = generate_config(args.lines)
+
+    # The trees must be identical, with and without list values
+    for options in ({}, {'list_values': False}):
+        if section_state(ConfigObj(lines, **options)) != section_state(ReferenceConfigObj(lines, **options)):
+            sys.exit("FAIL: fast path differs from the general parser with options {}".format(options))
+    print("Fast path produces identical Section trees ({} lines)".format(len(lines)))
+
+    reference = time_parse(ReferenceConfigObj, lines, args.repeat)
+    fast = time_parse(ConfigObj, lines, args.repeat)
+    print("General parser: {:.0f} ms".format(reference * 1000))
+    print("Fast path:      {:.0f} ms ({:.1f}x)".format(fast * 1000, reference / fast))
+
+
+if __name__ == "__main__":
+    main()
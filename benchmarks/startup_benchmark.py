@@ -0,0 +1,87 @@
+"""
+Startup benchmark for 144 Blocks
+
+Runs the part of a launch that needs no windows in a fresh interpreter using
+`python -X importtime`: importing the application module, loading the
+settings and loading the startup plan. Reports the slowest imports and checks
+the total launch time against a budget.
+
+Usage:
+    python3 benchmarks/startup_benchmark.py [--budget MS] [--repeat N] [--top N]
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Load 144_blocks.py as a module (__name__ is not "__main__" so no window is created), then the settings and startup plan
+LAUNCH_APP = (
+    "import importlib.util, os;"
+    "spec = importlib.util.spec_from_file_location('blocks_app', '144_blocks.py');"
+    "app = importlib.util.module_from_spec(spec);"
+    "spec.loader.exec_module(app);"
+    "app.load_settings_data('./settings.ini');"
+    "app.load_startup_plan(os.listdir('./saved_plans/'))"
+)
+
+
+# Run one interpreter with -X importtime and return (wall time in ms, stderr report)
+def time_startup():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", LAUNCH_APP],
+                            cwd=REPO_DIR, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    return (time.perf_counter() - start) * 1000, result.stderr
+
+
+# Parse the -X importtime report into [(cumulative us, self us, module name)]
+def parse_importtime(report):
+    imports = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the launch time of 144 Blocks")
+    parser.add_argument("--budget", type=float, default=150.0, help="launch time budget in milliseconds")
+    parser.add_argument("--repeat", type=int, default=5, help="number of interpreter launches")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        wall_ms, report = time_startup()
+        timings.append(wall_ms)
+
+    print("Slowest imports (last run):")
+    print("{:>12} {:>10}  {}".format("cumul [us]", "self [us]", "module"))
+    for cumulative_us, self_us, name in sorted(parse_importtime(report), reverse=True)[:args.top]:
+        print("{:>12} {:>10}  {}".format(cumulative_us, self_us, name))
+
+    heavy_modules = [m for m in ("configobj", "six", "PIL", "subprocess", "tkinter.messagebox")
+                     if any(name.strip() == m for _, _, name in parse_importtime(report))]
+    print("\nHeavy modules imported at startup: " + (", ".join(heavy_modules) or "none"))
+
+    median_ms = statistics.median(timings)
+    print("Launch time: median {:.1f} ms, min {:.1f} ms over {} runs (budget {:.0f} ms)".format(
+        median_ms, min(timings), args.repeat, args.budget))
+
+    if median_ms > args.budget:
+        print("FAIL: launch time is over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Validation benchmark for configobj
+
+Validates a generated config with many keys against its configspec several
+times, the way a long-running process re-validates a shared config. The first
+validation compiles the configspec checks, later ones reuse them. The same
+validations are also timed with the compiled-check cache switched off, where
+every entry compiles its check, as the reference.
+
+Needs the validate module (validate.py from the configobj distribution).
+
+Usage:
+    python3 benchmarks/validate_benchmark.py [--keys N] [--repeat N]
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import configobj
+from configobj import ConfigObj
+
+try:
+    from validate import Validator
+except ImportError:
+    sys.exit("The validate module (validate.py from configobj) is required for this benchmark")
+
+KEYS_PER_SECTION = 100
+
+# The check applied to each key, with a matching value
+CHECKS = [
+    ('integer(min=0, max=1000000, default=0)', '{}'),
+    ('float(default=1.5)', '{}.25'),
+    ('boolean(default=False)', 'True'),
+    ('string(max=64, default="")', 'value_{}'),
+    ('option("a", "b", "c", default="a")', 'b'),
+    ('int_list(min=1, max=4, default=list(1, 2))', '1, {}'),
+]
+
+
+class NoCompiledChecks(dict):
+    """Compiled-check cache that keeps nothing, so every entry compiles its check"""
+    def __setitem__(self, key, value):
+        pass
+
+
+# Return (config lines, configspec lines) with num_keys keys in sections of KEYS_PER_SECTION
+def generate_config(num_keys):
+    config_lines = []
+    spec_lines = []
+    for section in range(num_keys // KEYS_PER_SECTION):
+        config_lines.append('[section{}]'.format(section))
+        spec_lines.append('[section{}]'.format(section))
+        for key in range(KEYS_PER_SECTION):
+            (check, value) = CHECKS[key % len(CHECKS)]
+            config_lines.append('key{} = {}'.format(key, value.format(key)))
+            spec_lines.append('key{} = {}'.format(key, check))
+    return config_lines, spec_lines
+
+
+# Return (timing of each validation, results) of validating fresh configs against a shared configspec
+def time_validations(config_lines, spec_lines, repeat, cached=True):
+    configspec = ConfigObj(spec_lines, list_values=False, _inspec=True)
+    validator = Validator()
+    get_compiled_checks = configobj._get_compiled_checks
+    if not cached:
+        configobj._get_compiled_checks = lambda configspec, validator: NoCompiledChecks()
+    timings = []
+    results = []
+    try:
+        for _ in range(repeat):
+            # a freshly parsed config each time, validated against the shared configspec
+            config = ConfigObj(config_lines, configspec=configspec)
+            start = time.perf_counter()
+            results.append(config.validate(validator))
+            timings.append(time.perf_counter() - start)
+    finally:
+        configobj._get_compiled_checks = get_compiled_checks
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time repeated ConfigObj.validate calls")
+    parser.add_argument("--keys", type=int, default=10000, help="number of keys in the config")
+    parser.add_argument("--repeat", type=int, default=5, help="number of validations")
+    args = parser.parse_args()
+
+    (config_lines, spec_lines) = generate_config(args.keys)
+    (reference, reference_results) = time_validations(config_lines, spec_lines, args.repeat, cached=False)
+    (timings, results) = time_validations(config_lines, spec_lines, args.repeat)
+    if any(result is not True for result in results + reference_results):
+        sys.exit("Validation failed")
+
+    reference_average = sum(reference) / len(reference)
+    print("Validated {} keys {} times".format(args.keys, args.repeat))
+    print("Without the compiled-check cache: {:.1f} ms on average".format(reference_average * 1000))
+    print("First validation: {:.1f} ms".format(timings[0] * 1000))
+    if len(timings) > 1:
+        repeated = sum(timings[1:]) / len(timings[1:])
+        print("Repeated validations: {:.1f} ms on average ({:.1f}x)".format(repeated * 1000, reference_average / repeated))
+
+
+if __name__ == "__main__":
+    main()
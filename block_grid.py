@@ -0,0 +1,127 @@
+"""
+Compact storage of the activity linked to each block
+
+Activity names are interned into small integer ids (0 is '-1', unlinked),
+and the 144 blocks of a day are stored as a flat bytearray of ids. The grid
+can still be used as block_linking[row][col] with activity names, so
+existing code keeps working, while hot loops compare integer ids.
+
+Which blocks are productive is given as a 144-bit mask (bit i is block i),
+from which the productive index (see productive_index) is built.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+UNLINKED_ID = 0
+MAX_ACTIVITIES = 255
+
+
+class ActivityTable:
+    """Interns activity names as small integer ids. Ids are never reused, so they stay valid across settings reloads"""
+    def __init__(self, names=()):
+        self.names = ['-1'] # id -> name
+        self.ids = {'-1': UNLINKED_ID} # name -> id
+        for name in names:
+            self.id_of(name)
+
+    # Return the id of an activity, interning it if it is new
+    def id_of(self, name):
+        act_id = self.ids.get(name)
+        if act_id is None:
+            if len(self.names) > MAX_ACTIVITIES:
+                raise ValueError("Too many activities (the maximum is {})".format(MAX_ACTIVITIES))
+            act_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return act_id
+
+    def name_of(self, act_id):
+        return self.names[act_id]
+
+    # Return a lookup of 256 bytes, 1 for the ids of productive activities
+    def productive_lookup(self, acts):
+        lookup = bytearray(MAX_ACTIVITIES + 1)
+        for act_id, name in enumerate(self.names):
+            if name in acts and str(acts[name]['productive']) == "True":
+                lookup[act_id] = 1
+        return bytes(lookup)
+
+
+class BlockGrid:
+    """The activity id of each of the 144 blocks, viewable as 24 rows of 6 activity names"""
+    def __init__(self, table, block_linking=None):
+        """
+        Parameters:
+        -----------
+            table : ActivityTable
+            block_linking : [[str]] or None
+                24 rows of 6 activity names to initialise the grid with (all unlinked if None)
+        """
+        self.table = table
+        self.ids = bytearray(144)
+        if block_linking is not None:
+            for row in range(24):
+                for col in range(6):
+                    self.ids[row*6+col] = table.id_of(block_linking[row][col])
+
+    def __getitem__(self, row):
+        return GridRow(self, row)
+
+    def __len__(self):
+        return 24
+
+    def __iter__(self):
+        return (GridRow(self, row) for row in range(24))
+
+    def __eq__(self, other):
+        return self.to_lists() == [list(row) for row in other]
+
+    # Return the grid as 24 lists of 6 activity names
+    def to_lists(self):
+        names = self.table.names
+        return [[names[act_id] for act_id in self.ids[row*6:row*6+6]] for row in range(24)]
+
+    # Return the mask of blocks whose activity is productive in a productive_lookup
+    def productive_mask(self, lookup):
+        flags = self.ids.translate(lookup)
+        mask = 0
+        index = flags.find(1)
+        while index != -1:
+            mask |= 1 << index
+            index = flags.find(1, index + 1)
+        return mask
+
+    # Return an independent copy of the grid (sharing the activity table)
+    def copy(self):
+        grid = BlockGrid(self.table)
+        grid.ids[:] = self.ids
+        return grid
+
+
+class GridRow:
+    """View of one row of a BlockGrid, indexed by column with activity names"""
+    __slots__ = ('grid', 'row')
+
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return [self.grid.table.names[act_id] for act_id in self.grid.ids[self.row*6:self.row*6+6][col]]
+        if not 0 <= col < 6:
+            raise IndexError("column out of range")
+        return self.grid.table.names[self.grid.ids[self.row*6+col]]
+
+    def __setitem__(self, col, name):
+        if not 0 <= col < 6:
+            raise IndexError("column out of range")
+        self.grid.ids[self.row*6+col] = self.grid.table.id_of(name)
+
+    def __len__(self):
+        return 6
+
+    def __iter__(self):
+        return iter(self[:])
@@ -88,6 +88,8 @@ __all__ = (
     'DuplicateError',
     'ConfigspecError',
     'ConfigObj',
+    'LazyConfigObj',
+    'CompactSection',
     'SimpleVal',
     'InterpolationError',
     'InterpolationLoopError',
@@ -478,7 +480,10 @@ class Section(dict):
         self.__dict__.update(state[1])
 
     def __reduce__(self):
-        state = (dict(self), self.__dict__)
+        # compiled configspec checks are a cache, and hold the validator
+        attributes = dict(self.__dict__)
+        attributes.pop('_compiled_checks', None)
+        state = (dict(self), attributes)
         return (__newobj__, (self.__class__,), state)
     
     
@@ -781,6 +786,23 @@ class Section(dict):
         return newdict
 
 
+    def compact(self):
+        """
+        Return a read-only ``CompactSection`` copy of self.
+        
+        Comments, defaults, configspec and other round-trip information are
+        dropped, values are interpolated (and interned) and list values become
+        tuples.
+        Sections with the same keys (in the same order) share one key layout,
+        which suits files of many small similar sections.
+        
+        >>> c = a.compact()
+        >>> c.dict() == a.dict()
+        1
+        """
+        return CompactSection._from_section(self, {})
+
+
     def merge(self, indict):
         """
         A recursive update - useful for merging config files.
@@ -1096,6 +1118,26 @@ class ConfigObj(Section):
         $''',
         re.VERBOSE)
 
+    # fast path for the common ``key = value`` line with an unquoted key and
+    # a single unquoted value, and no inline comment. Lines that don't match
+    # go through the general ``_sectionmarker``/``_keyword`` path.
+    _simple_keyword = re.compile(r'''^
+        (\s*)                         # indentation
+        ([^\s'"=\[\#](?:[^'"=]*[^\s'"=])?)      # keyword
+        \s*=\s*                       # divider
+        ([^'",\#\s](?:[^'",\#]*[^'",\#\s])?)    # value
+        \s*$''',
+        re.VERBOSE)
+
+    # the same, when lists are switched off (commas are allowed)
+    _simple_keyword_nolist = re.compile(r'''^
+        (\s*)                         # indentation
+        ([^\s'"=\[\#](?:[^'"=]*[^\s'"=])?)      # keyword
+        \s*=\s*                       # divider
+        ([^'"\#\s](?:[^'"\#]*[^'"\#\s])?)      # value
+        \s*$''',
+        re.VERBOSE)
+
     # this regexp pulls list values out as a single string
     # or single values and comments
     # FIXME: this regex adds a '' to the end of comma terminated lists
@@ -1552,11 +1594,41 @@ class ConfigObj(Section):
         cur_index = -1
         reset_comment = False
         
+        # simple values need no unquoting or list handling
+        if self.unrepr or self._inspec:
+            simple_keyword = None
+        elif self.list_values:
+            simple_keyword = self._simple_keyword
+        else:
+            simple_keyword = self._simple_keyword_nolist
+        simple_match = simple_keyword.match if simple_keyword is not None else None
+        
         while cur_index < maxline:
             if reset_comment:
                 comment_list = []
             cur_index += 1
             line = infile[cur_index]
+            
+            mat = simple_match(line) if simple_match is not None else None
+            if mat is not None:
+                (indent, key, value) = mat.groups()
+                # duplicate keys are reported by the general path
+                if key not in this_section:
+                    if not done_start:
+                        # preserve initial comment
+                        self.initial_comment = comment_list
+                        comment_list = []
+                        done_start = True
+                    reset_comment = True
+                    if indent and (self.indent_type is None):
+                        self.indent_type = indent
+                    # equivalent to ``__setitem__`` for a new string value
+                    this_section.scalars.append(key)
+                    dict.__setitem__(this_section, key, value)
+                    this_section.inline_comments[key] = None
+                    this_section.comments[key] = comment_list
+                    continue
+            
             sline = line.strip()
             # do we have anything on the line ?
             if not sline or sline.startswith('#'):
@@ -2188,21 +2260,25 @@ class ConfigObj(Section):
         self._set_configspec(section, copy)
 
         
-        def validate_entry(entry, spec, val, missing, ret_true, ret_false):
+        compiled_checks = _get_compiled_checks(configspec, validator)
+        
+        def compile_check(spec):
+            compiled = compiled_checks.get(spec)
+            if compiled is None:
+                compiled = compiled_checks[spec] = _CompiledCheck(validator, spec)
+            return compiled
+        
+        def validate_entry(entry, spec, val, missing, ret_true, ret_false,
+                           has_default=True):
             section.default_values.pop(entry, None)
-                
-            try:
-                section.default_values[entry] = validator.get_default_value(configspec[entry])
-            except (KeyError, AttributeError, validator.baseErrorClass):
-                # No default, bad default or validator has no 'get_default_value'
-                # (e.g. SimpleVal)
-                pass
+            
+            compiled = compile_check(spec)
+            # entries validated by __many__ have no default
+            if has_default and compiled.has_default:
+                section.default_values[entry] = compiled.default_value()
             
             try:
-                check = validator.check(spec,
-                                        val,
-                                        missing=missing
-                                        )
+                check = compiled.check(val, missing=missing)
             except validator.baseErrorClass as e:
                 if not preserve_errors or isinstance(e, self._vdtMissingValue):
                     out[entry] = False
@@ -2237,20 +2313,23 @@ class ConfigObj(Section):
         ret_true = True
         ret_false = True
         
+        # sets for the membership tests, as these lists can be long
+        section_scalars = set(section.scalars)
+        section_defaults = set(section.defaults)
         unvalidated = [k for k in section.scalars if k not in configspec]
-        incorrect_sections = [k for k in configspec.sections if k in section.scalars]        
+        incorrect_sections = [k for k in configspec.sections if k in section_scalars]
         incorrect_scalars = [k for k in configspec.scalars if k in section.sections]
         
         for entry in configspec.scalars:
             if entry in ('__many__', '___many___'):
                 # reserved names
                 continue
-            if (not entry in section.scalars) or (entry in section.defaults):
+            if (not entry in section_scalars) or (entry in section_defaults):
                 # missing entries
                 # or entries from defaults
                 missing = True
                 val = None
-                if copy and entry not in section.scalars:
+                if copy and entry not in section_scalars:
                     # copy comments
                     section.comments[entry] = (
                         configspec.comments.get(entry, []))
@@ -2274,7 +2353,8 @@ class ConfigObj(Section):
             for entry in unvalidated:
                 val = section[entry]
                 ret_true, ret_false = validate_entry(entry, many, val, False,
-                                                     ret_true, ret_false)
+                                                     ret_true, ret_false,
+                                                     has_default=False)
             unvalidated = []
 
         for entry in incorrect_scalars:
@@ -2371,6 +2451,299 @@ class ConfigObj(Section):
         
 
 
+class LazyConfigObj(object):
+    """
+    A read-only view of a config file that parses sections on first access.
+    
+    ``LazyConfigObj(filename, encoding='utf_8', **options)``
+    
+    The file is memory-mapped and only scanned for the byte offsets of its
+    top level ``[section]`` markers. Values before the first section are
+    parsed straight away; each top level section (with its subsections) is
+    parsed by ``ConfigObj`` the first time it is accessed, so reading one
+    section of a large file costs about as much as that section.
+    
+    ``options`` are passed to ``ConfigObj`` for each parse. Interpolation
+    only sees the section being read and the top level values are not
+    available to it. Files containing triple quoted (multiline) values are
+    parsed in full on opening, as a multiline value could contain a line
+    that looks like a section marker.
+    
+    Use ``close`` (or a ``with`` block) to release the file.
+    """
+    
+    # a top level section marker: a single '[', not '[['
+    _top_section_marker = re.compile(
+        br'^[ \t]*\[(?![ \t]*\[)(.*?)\][ \t]*(?:\#[^\r\n]*)?\r?$', re.MULTILINE)
+    
+    def __init__(self, filename, encoding='utf_8', **options):
+        import mmap
+        
+        self.filename = filename
+        self.encoding = encoding
+        self._options = options
+        self._parsed = {}
+        self._offsets = {}
+        self.sections = []
+        
+        self._file = open(filename, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # an empty file can't be memory-mapped
+            self._data = b''
+        start = len(BOM_UTF8) if self._data[:len(BOM_UTF8)] == BOM_UTF8 else 0
+        
+        if self._data.find(b'"""') != -1 or self._data.find(b"'''") != -1:
+            config = ConfigObj(self._lines(start, len(self._data)), **options)
+            self._header = config
+            self.sections = list(config.sections)
+            for name in self.sections:
+                self._parsed[name] = config[name]
+            self.scalars = config.scalars
+            return
+        
+        markers = list(self._top_section_marker.finditer(self._data, start))
+        header_end = markers[0].start() if markers else len(self._data)
+        self._header = ConfigObj(self._lines(start, header_end), **options)
+        self.scalars = self._header.scalars
+        
+        for index, marker in enumerate(markers):
+            name = marker.group(1).strip().decode(encoding)
+            if name[:1] in ('"', "'") and name[-1:] == name[:1] and len(name) > 1:
+                name = name[1:-1]
+            if name in self._offsets or name in self._header:
+                line_number = self._data[:marker.start()].count(b'\n') + 1
+                raise DuplicateError('Duplicate section name at line %s.' % line_number,
+                                     line_number, marker.group(0).decode(encoding))
+            end = markers[index + 1].start() if index + 1 < len(markers) else len(self._data)
+            self._offsets[name] = (marker.start(), end)
+            self.sections.append(name)
+    
+    
+    def _lines(self, start, end):
+        """Decode a byte range of the file into lines for ``ConfigObj``."""
+        return self._data[start:end].decode(self.encoding).split('\n')
+    
+    
+    def __getitem__(self, key):
+        if key in self._parsed:
+            return self._parsed[key]
+        if key in self._offsets:
+            (start, end) = self._offsets[key]
+            config = ConfigObj(self._lines(start, end), **self._options)
+            section = self._parsed[key] = config[key]
+            return section
+        return self._header[key]
+    
+    
+    def __contains__(self, key):
+        return key in self._offsets or key in self._parsed or key in self._header
+    
+    
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+    
+    
+    def keys(self):
+        """Return the top level keys: scalars, then sections."""
+        return self.scalars + self.sections
+    
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    
+    def __len__(self):
+        return len(self.scalars) + len(self.sections)
+    
+    
+    def __repr__(self):
+        return 'LazyConfigObj(%r)' % self.filename
+    
+    
+    def close(self):
+        """Release the memory map and the file. Parsed sections stay usable."""
+        if not isinstance(self._data, bytes):
+            self._data.close()
+        self._file.close()
+    
+    
+    def __enter__(self):
+        return self
+    
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+class CompactSection(object):
+    """
+    A compact, read-only section - as returned by ``Section.compact``.
+    
+    It supports the read-only mapping interface (iteration follows the order
+    scalars, then sections) plus ``scalars``, ``sections`` and ``dict``.
+    Values are stored in a tuple against a key layout that is shared between
+    sections with the same keys, so there is no per-section dictionary.
+    """
+    
+    __slots__ = ('name', 'depth', '_layout', '_values')
+    
+    @classmethod
+    def _from_section(cls, section, layouts):
+        """Convert a ``Section``, sharing key layouts through ``layouts``."""
+        keys = tuple(sys.intern(key) for key in section.scalars + section.sections)
+        layout = layouts.get((keys, len(section.scalars)))
+        if layout is None:
+            index = dict((key, i) for i, key in enumerate(keys))
+            layout = layouts[(keys, len(section.scalars))] = (keys, index, len(section.scalars))
+        
+        values = []
+        for key in section.scalars:
+            value = section[key]
+            # repeated values (like activity names) are stored once
+            if isinstance(value, str):
+                value = sys.intern(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            values.append(value)
+        for key in section.sections:
+            values.append(cls._from_section(section[key], layouts))
+        
+        compact = cls()
+        compact.name = section.name
+        compact.depth = section.depth
+        compact._layout = layout
+        compact._values = tuple(values)
+        return compact
+    
+    
+    @property
+    def scalars(self):
+        return list(self._layout[0][:self._layout[2]])
+    
+    
+    @property
+    def sections(self):
+        return list(self._layout[0][self._layout[2]:])
+    
+    
+    def __getitem__(self, key):
+        return self._values[self._layout[1][key]]
+    
+    
+    def get(self, key, default=None):
+        index = self._layout[1].get(key)
+        if index is None:
+            return default
+        return self._values[index]
+    
+    
+    def __contains__(self, key):
+        return key in self._layout[1]
+    
+    
+    def __iter__(self):
+        return iter(self._layout[0])
+    
+    
+    def __len__(self):
+        return len(self._values)
+    
+    
+    def keys(self):
+        return list(self._layout[0])
+    
+    
+    def values(self):
+        return list(self._values)
+    
+    
+    def items(self):
+        return list(zip(self._layout[0], self._values))
+    
+    
+    def dict(self):
+        """Return a copy of self as nested ordinary dictionaries."""
+        return dict((key, value.dict() if isinstance(value, CompactSection) else value)
+                    for key, value in self.items())
+    
+    
+    def __repr__(self):
+        return '{%s}' % ', '.join(['%r: %r' % item for item in self.items()])
+
+
+class _CompiledCheck(object):
+    """
+    A configspec check string compiled against a validator.
+    
+    The check string is parsed, the check function looked up and the default
+    value converted once; ``check`` then only calls the check function. For
+    validators without the *validate.py* internals (e.g. ``SimpleVal``) it
+    falls back to calling the validator for every value.
+    """
+    
+    def __init__(self, validator, spec):
+        self.validator = validator
+        self.spec = spec
+        self.fun = None
+        try:
+            (fun_name, fun_args, fun_kwargs,
+             self.default) = validator._parse_with_caching(spec)
+            self.fun = validator.functions[fun_name]
+        except (AttributeError, KeyError, validator.baseErrorClass):
+            # not a validate.py Validator, or an unknown/bad check - which
+            # ``validator.check`` will report
+            self.default = MISSING
+        else:
+            self.args = tuple(fun_args)
+            self.kwargs = fun_kwargs
+        
+        try:
+            self._default_value = validator.get_default_value(spec)
+        except (KeyError, AttributeError, validator.baseErrorClass):
+            # No default, bad default or validator has no 'get_default_value'
+            self._default_value = MISSING
+    
+    
+    @property
+    def has_default(self):
+        return self._default_value is not MISSING
+    
+    
+    def default_value(self):
+        """Return the converted default value (a fresh copy of lists)."""
+        if isinstance(self._default_value, list):
+            return list(self._default_value)
+        return self._default_value
+    
+    
+    def check(self, value, missing=False):
+        """Equivalent to ``validator.check(spec, value, missing=missing)``."""
+        if self.fun is None or (missing and not self.has_default):
+            return self.validator.check(self.spec, value, missing=missing)
+        if missing:
+            # the default has already been converted by the check function
+            return self.default_value()
+        if value is None:
+            return None
+        return self.fun(value, *self.args, **self.kwargs)
+
+
+def _get_compiled_checks(configspec, validator):
+    """
+    Return the cache of compiled checks for a configspec section, keyed by
+    check string. The cache is kept on the configspec, so it is reused by
+    every validation against it, and is reset if the validator changes.
+    """
+    cache = configspec.__dict__.get('_compiled_checks')
+    if cache is None or cache[0] is not validator:
+        cache = configspec._compiled_checks = (validator, {})
+    return cache[1]
+
+
 class SimpleVal(object):
     """
     A simple validator.
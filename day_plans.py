@@ -0,0 +1,102 @@
+"""
+Plans for specific days, and their prefetching before midnight
+
+A plan saved as ./saved_plans/YYYY-MM-DD.ini is the plan of that day,
+otherwise the plan is composed from the weekday templates (see
+plan_templates). Shortly before midnight the next day's plan is read and
+compiled (activity ids and productive index) in a background thread, so at
+midnight switching to it is a single state swap in the Tk thread.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import os
+import threading
+
+from block_grid import BlockGrid, UNLINKED_ID
+from productive_index import ProductiveIndex
+
+DAY_PLANS_DIR = './saved_plans/'
+
+_materialised_plans = None
+_materialised_plans_lock = threading.Lock()
+
+
+# Return the path of the plan of a day (a datetime.date)
+def day_plan_filename(day):
+    return os.path.join(DAY_PLANS_DIR, day.isoformat() + '.ini')
+
+
+# Return the plan of a day (24 rows of 6 activity names), or None if there is no plan or template for that day
+def load_day_plan(day):
+    filename = day_plan_filename(day)
+    if os.path.isfile(filename):
+        from read_write import read_saved_plan
+        return read_saved_plan(filename)
+    return materialised_plans().get(day)
+
+
+# Return the shared cache of plans composed from templates
+def materialised_plans():
+    global _materialised_plans
+    with _materialised_plans_lock:
+        if _materialised_plans is None:
+            from plan_templates import MaterialisedPlans
+            _materialised_plans = MaterialisedPlans()
+        return _materialised_plans
+
+
+class PrefetchedPlan:
+    """A day plan compiled against the activities at the time it was prefetched"""
+    def __init__(self, grid, productive_index, productive_lookup):
+        self.grid = grid
+        self.productive_index = productive_index
+        self.productive_lookup = productive_lookup
+
+
+class PlanPrefetcher:
+    """Loads and compiles the plan of a day in a background thread"""
+    def __init__(self, activity_table):
+        self.activity_table = activity_table
+        self.day = None
+        self.thread = None
+        self.result = None
+
+    # Start prefetching the plan of a day, unless it is already prefetched
+    def start(self, day, acts, productive_lookup):
+        if self.day == day:
+            return
+        self.day = day
+        self.result = None
+        # the thread only reads copies, as activities may be added in the Tk thread meanwhile
+        args = (day, dict(self.activity_table.ids), frozenset(acts), productive_lookup)
+        self.thread = threading.Thread(target=self.run, args=args, name="plan prefetch", daemon=True)
+        self.thread.start()
+
+    # Return the PrefetchedPlan of a day (None if the day has no plan), loading it now if it wasn't prefetched
+    def take(self, day, acts, productive_lookup):
+        if self.day != day:
+            self.start(day, acts, productive_lookup)
+        self.thread.join()
+        (result, self.result) = (self.result, None)
+        self.day = None
+        return result
+
+    # Thread: read the plan and compile it to activity ids and a productive index
+    def run(self, day, ids, act_names, productive_lookup):
+        try:
+            plan = load_day_plan(day)
+        except Exception as err: # e.g. an invalid plan file
+            print("Could not load the plan of " + day.isoformat() + ": " + str(err))
+            plan = None
+        if plan is None:
+            return
+        grid = BlockGrid(self.activity_table)
+        for row in range(24):
+            for col in range(6):
+                name = plan[row][col]
+                grid.ids[row*6+col] = ids.get(name, UNLINKED_ID) if name in act_names else UNLINKED_ID
+        self.result = PrefetchedPlan(grid, ProductiveIndex(grid.productive_mask(productive_lookup)), productive_lookup)
@@ -0,0 +1,153 @@
+"""
+Year at a glance heatmap of the plan history
+
+Shows the archived plans of a year (see plan_runs) as a heatmap with one
+column per day and one row per block, coloured by activity or by whether the
+block was productive. The image is built from one tile per month: a tile is
+rendered (with NumPy palette indexing) only when the history files of its
+days changed, and is otherwise taken from memory or from the tile cache in
+./cache/heatmap/.
+
+Requires Pillow and NumPy.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import calendar
+import marshal
+import os
+from datetime import date
+
+import numpy as np
+from PIL import Image, ImageColor
+
+from plan_runs import HISTORY_DIR, read_runs_file
+from read_write import write_marshal_file
+
+HEATMAP_CACHE_DIR = './cache/heatmap/'
+MODES = ('activity', 'productive')
+PRODUCTIVE_COLOUR = '#66ff66'
+# Pixels per day (width) and per block (height)
+CELL_WIDTH = 2
+CELL_HEIGHT = 2
+
+
+class YearHeatmap:
+    """Month tiles of the history heatmap, cached in memory and on disk"""
+    def __init__(self, acts, unlinked_colour, background_colour, history_dir=HISTORY_DIR, cache_dir=HEATMAP_CACHE_DIR):
+        """
+        Parameters:
+        -----------
+            acts : {str : {colour : str, productive : str}}
+                Activity settings (the '-1' entry is ignored)
+            unlinked_colour : str
+                Colour of unlinked blocks
+            background_colour : str
+                Colour of days without history
+        """
+        self.history_dir = history_dir
+        self.cache_dir = cache_dir
+        self.names = ['-1'] + sorted(act for act in acts if act != '-1')
+        self.ids = {name: act_id for act_id, name in enumerate(self.names)}
+        self.no_data = len(self.names) # palette index of days without history
+
+        def rgb(colour):
+            return ImageColor.getrgb(colour)[:3]
+        activity_colours = [rgb(unlinked_colour)] + [rgb(acts[name]['colour']) for name in self.names[1:]]
+        productive_colours = [rgb(unlinked_colour)] + [rgb(PRODUCTIVE_COLOUR) if str(acts[name]['productive']) == "True"
+                                                       else rgb(background_colour) for name in self.names[1:]]
+        self.palettes = {mode: np.array(colours + [rgb(background_colour)], dtype=np.uint8)
+                         for (mode, colours) in zip(MODES, (activity_colours, productive_colours))}
+
+        self.tiles = {} # (year, month, mode) -> (key, image), for this session
+        self.index_filename = os.path.join(self.cache_dir, 'tiles.cache')
+        try:
+            with open(self.index_filename, 'rb') as f:
+                self.index = marshal.load(f) # tile filename -> key
+        except (OSError, EOFError, ValueError, TypeError):
+            self.index = {}
+
+    # Return the history file of a day
+    def history_file(self, day):
+        return os.path.join(self.history_dir, day.isoformat() + '.rle')
+
+    # Return the key of a month tile: the colours and the (day, size, mtime) of each history file of the month
+    def tile_key(self, year, month, mode):
+        files = []
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            try:
+                stat = os.stat(self.history_file(date(year, month, day)))
+            except OSError:
+                continue
+            files.append((day, stat.st_size, stat.st_mtime_ns))
+        return (mode, self.palettes[mode].tobytes(), tuple(self.names), tuple(files))
+
+    # Return the activity ids (days x 144) of the history of a month, no_data for days without history
+    def month_ids(self, year, month):
+        num_days = calendar.monthrange(year, month)[1]
+        ids = np.full((num_days, 144), self.no_data, dtype=np.uint16)
+        for day in range(1, num_days + 1):
+            filename = self.history_file(date(year, month, day))
+            if not os.path.isfile(filename):
+                continue
+            try:
+                runs = read_runs_file(filename)
+            except (OSError, ValueError):
+                continue
+            lengths = [length for (_, length) in runs]
+            if sum(lengths) == 144:
+                ids[day-1] = np.repeat([self.ids.get(activity, 0) for (activity, _) in runs], lengths)
+        return ids
+
+    # Return the tile of a month (PIL image, one column per day), rendering it only if its history changed
+    def month_tile(self, year, month, mode):
+        key = self.tile_key(year, month, mode)
+        cached = self.tiles.get((year, month, mode))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        tile_name = "{}-{:02d}-{}.png".format(year, month, mode)
+        tile_filename = os.path.join(self.cache_dir, tile_name)
+        tile = None
+        if self.index.get(tile_name) == key:
+            try:
+                tile = Image.open(tile_filename)
+                tile.load()
+            except OSError:
+                tile = None
+        if tile is None:
+            tile = self.render_tile(year, month, mode)
+            self.save_tile(tile_name, tile, key)
+        self.tiles[(year, month, mode)] = (key, tile)
+        return tile
+
+    # Render a month tile: blocks as rows, days as columns
+    def render_tile(self, year, month, mode):
+        pixels = self.palettes[mode][self.month_ids(year, month).T] # (144, days, 3)
+        pixels = np.repeat(np.repeat(pixels, CELL_HEIGHT, axis=0), CELL_WIDTH, axis=1)
+        return Image.fromarray(pixels, 'RGB')
+
+    # Write a tile and its key to the tile cache
+    def save_tile(self, tile_name, tile, key):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tile.save(os.path.join(self.cache_dir, tile_name))
+            self.index[tile_name] = key
+            write_marshal_file(self.index_filename, self.index)
+        except OSError:
+            pass # caching is only an optimisation
+
+    # Return (image of a year, x offset of each month)
+    def year_image(self, year, mode):
+        tiles = [self.month_tile(year, month, mode) for month in range(1, 13)]
+        image = Image.new('RGB', (sum(tile.size[0] for tile in tiles), 144*CELL_HEIGHT))
+        offsets = []
+        x = 0
+        for tile in tiles:
+            image.paste(tile, (x, 0))
+            offsets.append(x)
+            x += tile.size[0]
+        return (image, offsets)
@@ -0,0 +1,177 @@
+"""
+Bitmap index of the plan history
+
+For every activity the index keeps one bitmap per archived day, 144 bits
+(one per block) packed into 18 bytes, so questions such as "which days had
+Exercise before 08:00" are answered with bitwise operations over packed
+arrays instead of parsing every plan:
+
+    from history_index import load_history_index, time_block
+    index = load_history_index()
+    early = index.matches('Exercise', 0, time_block("08:00"))
+    late_work = index.matches('Work', time_block("20:00"), 144)
+    print(index.dates(early & ~late_work))
+
+The index is stored next to the history as ./history/activity_index.npz. It
+is updated incrementally when a day is archived, and brought up to date
+with the history files (new, changed or deleted days) when it is loaded.
+
+Requires NumPy.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import os
+import zipfile
+from datetime import date
+
+import numpy as np
+
+from plan_runs import HISTORY_DIR, read_runs_file, runs_plan
+
+INDEX_FILENAME = os.path.join(HISTORY_DIR, 'activity_index.npz')
+PACKED_BYTES = 18 # 144 bits
+# Number of set bits of each byte value
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+# Return the block starting at a time 'HH:MM'
+def time_block(hhmm):
+    (hours, minutes) = hhmm.split(':')
+    return int(hours)*6 + int(minutes)//10
+
+
+# Return the packed bitmap (18 bytes) of the blocks [start, end)
+def block_range_mask(start, end):
+    bits = np.zeros(144, dtype=bool)
+    bits[max(0, start):max(0, min(end, 144))] = True
+    return np.packbits(bits)
+
+
+class HistoryIndex:
+    """Per-activity bitmaps of the blocks of each archived day"""
+    def __init__(self):
+        self.days = [] # date ordinals, in the order of the bitmap rows
+        self.rows = {} # date ordinal -> row
+        self.mtimes = [] # mtime of each day's history file when it was indexed
+        self.activities = []
+        self.activity_ids = {}
+        self.bitmaps = np.zeros((0, 0, PACKED_BYTES), dtype=np.uint8) # (activities, days, 18)
+
+    # Return the index stored in a file (an empty index if there is none)
+    @classmethod
+    def load(cls, filename=INDEX_FILENAME):
+        index = cls()
+        try:
+            with np.load(filename, allow_pickle=False) as data:
+                index.days = [int(day) for day in data['days']]
+                index.mtimes = [int(mtime) for mtime in data['mtimes']]
+                index.activities = [str(activity) for activity in data['activities']]
+                index.bitmaps = data['bitmaps']
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            return cls()
+        index.rows = {day: row for row, day in enumerate(index.days)}
+        index.activity_ids = {activity: act_id for act_id, activity in enumerate(index.activities)}
+        return index
+
+    # Write the index to a file, atomically
+    def save(self, filename=INDEX_FILENAME):
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'wb') as f:
+            np.savez(f, days=np.array(self.days, dtype=np.int64), mtimes=np.array(self.mtimes, dtype=np.int64),
+                     activities=np.array(self.activities, dtype=str), bitmaps=self.bitmaps)
+        os.replace(temp_filename, filename)
+
+    # Index (or re-index) the plan of a day (block_linking[row][col] of activity names)
+    def add_day(self, day, block_linking, mtime=0):
+        blocks = np.array([block_linking[row][col] for row in range(24) for col in range(6)], dtype=object)
+        for activity in set(blocks):
+            if activity not in self.activity_ids:
+                self.activity_ids[activity] = len(self.activities)
+                self.activities.append(activity)
+                self.bitmaps = np.concatenate([self.bitmaps, np.zeros((1, len(self.days), PACKED_BYTES), dtype=np.uint8)])
+        row = self.rows.get(day.toordinal())
+        if row is None:
+            row = self.rows[day.toordinal()] = len(self.days)
+            self.days.append(day.toordinal())
+            self.mtimes.append(mtime)
+            self.bitmaps = np.concatenate([self.bitmaps, np.zeros((len(self.activities), 1, PACKED_BYTES), dtype=np.uint8)], axis=1)
+        self.mtimes[row] = mtime
+        self.bitmaps[:, row] = 0
+        for activity in set(blocks):
+            self.bitmaps[self.activity_ids[activity], row] = np.packbits(blocks == activity)
+
+    # Drop the days (date ordinals) that are no longer in the history
+    def remove_days(self, days):
+        keep = [row for row, day in enumerate(self.days) if day not in days]
+        self.days = [self.days[row] for row in keep]
+        self.mtimes = [self.mtimes[row] for row in keep]
+        self.bitmaps = self.bitmaps[:, keep]
+        self.rows = {day: row for row, day in enumerate(self.days)}
+
+    # Bring the index up to date with the history files; return True if it changed
+    def sync(self, history_dir=HISTORY_DIR):
+        changed = False
+        on_disk = set()
+        for filename in os.listdir(history_dir) if os.path.isdir(history_dir) else []:
+            if not filename.endswith('.rle'):
+                continue
+            try:
+                day = date.fromisoformat(filename[:-4])
+                mtime = os.stat(os.path.join(history_dir, filename)).st_mtime_ns
+            except (ValueError, OSError):
+                continue
+            on_disk.add(day.toordinal())
+            row = self.rows.get(day.toordinal())
+            if row is not None and self.mtimes[row] == mtime:
+                continue
+            try:
+                plan = runs_plan(read_runs_file(os.path.join(history_dir, filename)))
+            except (OSError, ValueError):
+                continue
+            self.add_day(day, plan, mtime)
+            changed = True
+        removed = set(self.days) - on_disk
+        if len(removed) > 0:
+            self.remove_days(removed)
+            changed = True
+        return changed
+
+    # Return a boolean array over the days: True where the activity fills at least min_blocks of the blocks [start, end)
+    def matches(self, activity, start=0, end=144, min_blocks=1):
+        return self.counts(activity, start, end) >= min_blocks
+
+    # Return the number of blocks of an activity among the blocks [start, end) of each day
+    def counts(self, activity, start=0, end=144):
+        if activity not in self.activity_ids:
+            return np.zeros(len(self.days), dtype=np.int64)
+        masked = self.bitmaps[self.activity_ids[activity]] & block_range_mask(start, end)
+        return POPCOUNT[masked].sum(axis=1, dtype=np.int64)
+
+    # Return the dates (sorted) selected by a boolean array over the days
+    def dates(self, selection):
+        return sorted(date.fromordinal(day) for day, selected in zip(self.days, selection) if selected)
+
+
+# Return the index of the history, brought up to date with the history files (and saved if it changed)
+def load_history_index(history_dir=HISTORY_DIR):
+    filename = os.path.join(history_dir, 'activity_index.npz')
+    index = HistoryIndex.load(filename)
+    if index.sync(history_dir):
+        try:
+            index.save(filename)
+        except OSError:
+            pass # the index is rebuilt from the history next time
+    return index
+
+
+# Add an archived day to the stored index (called after the day's history file is written)
+def index_archived_day(day, block_linking, history_dir=HISTORY_DIR):
+    filename = os.path.join(history_dir, 'activity_index.npz')
+    index = HistoryIndex.load(filename)
+    mtime = os.stat(os.path.join(history_dir, day.isoformat() + '.rle')).st_mtime_ns
+    index.add_day(day, block_linking, mtime)
+    index.save(filename)
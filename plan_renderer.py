@@ -0,0 +1,145 @@
+"""
+Headless rendering of plans to PNG images
+
+Renders a plan as the 24 x 6 grid of blocks shown by the application, without
+Tk. Activity icons are loaded once into an atlas (one RGBA tile per
+activity), and a plan is rendered by indexing the atlas and the colour
+palette with the activity ids of its blocks, so a whole image is composed in
+a few NumPy operations. Directories of plans (.ini plan files or .rle
+history files) are rendered in parallel, one process per CPU core:
+
+    python3 plan_renderer.py ./history/ ./rendered/ --settings settings.ini --size 20
+
+Requires Pillow and NumPy.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import argparse
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image, ImageColor
+
+# Pixels around each block
+PADDING = 1
+
+# Atlas of the worker process, loaded once by init_worker
+_atlas = None
+
+
+class IconAtlas:
+    """Colour and icon tile of each activity, indexed by activity id (0 is unlinked)"""
+    def __init__(self, act_settings, unlinked_colour, background_colour, size):
+        """
+        Parameters:
+        -----------
+            act_settings : {str : {source : str, colour : str}}
+                Activity settings, as returned by read_write.load_settings_data
+            unlinked_colour : str
+            background_colour : str
+            size : int
+                Size of a block (pixels)
+        """
+        self.size = size
+        self.names = ['-1'] + sorted(act_settings)
+        self.ids = {name: act_id for act_id, name in enumerate(self.names)}
+        self.background = np.array(ImageColor.getrgb(background_colour)[:3], dtype=np.uint8)
+        self.palette = np.array([ImageColor.getrgb(unlinked_colour)[:3]] +
+                                [ImageColor.getrgb(act_settings[name]['colour'])[:3] for name in self.names[1:]], dtype=np.uint8)
+        self.icons = np.zeros((len(self.names), size, size, 4), dtype=np.uint8) # unlinked: no icon
+        for act_id, name in enumerate(self.names[1:], 1):
+            self.icons[act_id] = icon_tile(act_settings[name]['source'], size)
+
+    # Return the activity ids (144 uint8) of a plan (block_linking[row][col] of activity names)
+    def plan_ids(self, block_linking):
+        return np.array([self.ids.get(block_linking[row][col], 0) for row in range(24) for col in range(6)], dtype=np.uint8)
+
+    # Return the RGB image of a plan
+    def render(self, block_linking):
+        ids = self.plan_ids(block_linking)
+        icons = self.icons[ids].astype(np.uint16) # (144, size, size, 4)
+        alpha = icons[..., 3:]
+        colours = self.palette[ids].astype(np.uint16)[:, None, None, :]
+        tiles = ((colours * (255 - alpha) + icons[..., :3] * alpha) // 255).astype(np.uint8)
+
+        cell = self.size + 2*PADDING
+        grid = np.empty((144, cell, cell, 3), dtype=np.uint8)
+        grid[:] = self.background
+        grid[:, PADDING:PADDING+self.size, PADDING:PADDING+self.size] = tiles
+        pixels = grid.reshape(24, 6, cell, cell, 3).transpose(0, 2, 1, 3, 4).reshape(24*cell, 6*cell, 3)
+        return Image.fromarray(pixels, 'RGB')
+
+
+# Return an icon as a size x size RGBA array, scaled to fit and centred
+def icon_tile(filename, size):
+    icon = Image.open(filename).convert('RGBA')
+    icon.thumbnail((size, size), Image.LANCZOS)
+    tile = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    tile.paste(icon, ((size - icon.size[0])//2, (size - icon.size[1])//2))
+    return np.asarray(tile)
+
+
+# Return the plan of a plan file (.ini) or history file (.rle)
+def read_plan(filename):
+    if filename.endswith('.rle'):
+        from plan_runs import read_runs_file, runs_plan
+        return runs_plan(read_runs_file(filename))
+    from read_write import read_saved_plan
+    return read_saved_plan(filename)
+
+
+# Return the IconAtlas of a settings file, at a block size (the settings' button size if None)
+def load_atlas(settings_filename, size=None):
+    from read_write import load_settings_data
+
+    (colours, button_size, act_settings, _) = load_settings_data(settings_filename)
+    return IconAtlas(act_settings, colours[4], colours[2], button_size if size is None else size)
+
+
+def init_worker(settings_filename, size):
+    global _atlas
+    _atlas = load_atlas(settings_filename, size)
+
+
+# Worker: render one plan file to a PNG file; return (plan file, error message or None)
+def render_file(paths):
+    (plan_filename, image_filename) = paths
+    try:
+        _atlas.render(read_plan(plan_filename)).save(image_filename, optimize=False)
+    except Exception as err: # one bad plan must not stop the batch
+        return (plan_filename, str(err))
+    return (plan_filename, None)
+
+
+# Render every plan of a directory to PNG images in another, in parallel; return [(plan file, error)] of failures
+def render_directory(plan_dir, image_dir, settings_filename, size=None, processes=None):
+    os.makedirs(image_dir, exist_ok=True)
+    tasks = [(os.path.join(plan_dir, filename), os.path.join(image_dir, os.path.splitext(filename)[0] + '.png'))
+             for filename in sorted(os.listdir(plan_dir)) if filename.endswith(('.ini', '.rle'))]
+    with Pool(processes, initializer=init_worker, initargs=(settings_filename, size)) as pool:
+        results = pool.imap_unordered(render_file, tasks, chunksize=max(1, len(tasks) // (8 * (processes or os.cpu_count() or 1))))
+        return [(filename, error) for (filename, error) in results if error is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a directory of plans to PNG images")
+    parser.add_argument('plan_dir', help="directory of .ini plans or .rle history files")
+    parser.add_argument('image_dir', help="directory the images are written to")
+    parser.add_argument('--settings', default='./settings.ini', help="settings file with the activity colours and icons")
+    parser.add_argument('--size', type=int, default=None, help="block size in pixels (default: the button size of the settings)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: one per CPU core)")
+    args = parser.parse_args()
+
+    failures = render_directory(args.plan_dir, args.image_dir, args.settings, args.size, args.processes)
+    for (filename, error) in failures:
+        print("Could not render " + filename + ": " + error)
+    return 1 if len(failures) > 0 else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
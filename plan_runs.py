@@ -0,0 +1,101 @@
+"""
+Run-length encoded plans
+
+Plans are mostly long runs of the same activity (e.g. 48 consecutive Sleep
+blocks), so a plan is stored as its runs, one "length activity" line per
+run, and drawn as one rectangle per run. Past days are archived in this
+format as ./history/YYYY-MM-DD.rle.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import os
+
+HISTORY_DIR = './history/'
+
+
+# Return the runs [(activity, number of blocks)] of a plan (block_linking[row][col] of activity names)
+def plan_runs(block_linking):
+    runs = []
+    for row in range(24):
+        for col in range(6):
+            activity = block_linking[row][col]
+            if len(runs) > 0 and runs[-1][0] == activity:
+                runs[-1][1] += 1
+            else:
+                runs.append([activity, 1])
+    return [(activity, length) for (activity, length) in runs]
+
+
+# Return the plan (24 rows of 6 activity names) of runs
+def runs_plan(runs):
+    blocks = []
+    for (activity, length) in runs:
+        blocks.extend([activity] * length)
+    if len(blocks) != 144:
+        raise ValueError("Runs cover {} blocks instead of 144".format(len(blocks)))
+    return [blocks[row*6:row*6+6] for row in range(24)]
+
+
+# Write runs to a file, one "length activity" line per run, atomically
+def write_runs_file(path, runs):
+    temp_filename = path + '.tmp'
+    with open(temp_filename, 'w', encoding='utf-8') as f:
+        for (activity, length) in runs:
+            f.write(str(length) + " " + activity + "\n")
+    os.replace(temp_filename, path)
+
+
+# Return the runs of a file
+def read_runs_file(path):
+    runs = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if len(line) > 0:
+                (length, activity) = line.split(" ", 1)
+                runs.append((activity, int(length)))
+    return runs
+
+
+def history_filename(day):
+    return os.path.join(HISTORY_DIR, day.isoformat() + '.rle')
+
+
+# Archive the plan of a day (a datetime.date) in the history
+def archive_day_plan(day, block_linking):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    write_runs_file(history_filename(day), plan_runs(block_linking))
+
+
+# Return the archived plan of a day, or None if it isn't in the history
+def read_history_plan(day):
+    filename = history_filename(day)
+    if not os.path.isfile(filename):
+        return None
+    return runs_plan(read_runs_file(filename))
+
+
+# Draw runs on a Tk canvas as a horizontal timeline: one rectangle per run
+def draw_runs(canvas, runs, colours, x=0, y=0, block_width=2, height=20):
+    """
+    Parameters:
+    -----------
+        canvas : Tk Canvas
+        runs : [(str, int)]
+            Runs of (activity, number of blocks)
+        colours : {str : str}
+            Colour of each activity, including '-1' for unlinked blocks
+        block_width : int
+            Width of a block (pixels)
+    """
+    canvas.delete('runs')
+    start = 0
+    for (activity, length) in runs:
+        colour = colours.get(activity, colours['-1'])
+        canvas.create_rectangle(x + start*block_width, y, x + (start+length)*block_width, y + height,
+                                fill=colour, outline=colour, tags='runs')
+        start += length
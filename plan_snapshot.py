@@ -0,0 +1,94 @@
+"""
+Precompiled snapshot of the current plan, and the 'status' command
+
+The application writes the activity of each block, the activity names and
+which blocks are productive into a small marshal file whenever the plan or
+the settings change. The status command only reads that file, so it needs
+neither tkinter, configobj nor Pillow and runs quickly enough to be called
+from a shell prompt:
+
+    python3 144_blocks.py status
+
+or, skipping the compilation of 144_blocks.py, python3 plan_snapshot.py
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import marshal
+import os
+import time
+
+from read_write import write_marshal_file
+
+SNAPSHOT_FILENAME = './cache/plan.snapshot'
+SNAPSHOT_VERSION = 1
+
+
+# Write the snapshot: activity ids of the 144 blocks, activity names by id, and productive flags per id
+def write_plan_snapshot(ids, names, productive_lookup, filename=SNAPSHOT_FILENAME):
+    snapshot = {'version':SNAPSHOT_VERSION, 'blocks':bytes(ids), 'names':list(names),
+                'productive':bytes(ids).translate(productive_lookup)}
+    write_marshal_file(filename, snapshot)
+
+
+# Return the snapshot dictionary, or None if there is no valid snapshot
+def read_plan_snapshot(filename=SNAPSHOT_FILENAME):
+    try:
+        with open(filename, 'rb') as f:
+            snapshot = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+# Return 'HH:MM' of the start of a block
+def block_time(index):
+    return str(index//6 % 24).zfill(2) + ":" + str(index%6) + "0"
+
+
+# Return the name shown for an activity
+def activity_name(name):
+    return "(unlinked)" if name == '-1' else name
+
+
+# Return the status lines: current and next activity, productive blocks left and time to the next block
+def status_lines(snapshot, now=None):
+    now = time.localtime() if now is None else now
+    seconds = now.tm_hour*3600 + now.tm_min*60 + now.tm_sec
+    block = seconds // 600
+    blocks = snapshot['blocks']
+    names = snapshot['names']
+
+    activity = blocks[block]
+    end = block + 1
+    while end < len(blocks) and blocks[end] == activity:
+        end += 1
+    lines = ["Now: " + activity_name(names[activity]) + " until " + block_time(end)]
+    if end < len(blocks):
+        lines.append("Next: " + activity_name(names[blocks[end]]) + " at " + block_time(end))
+    lines.append("Productive blocks left: " + str(snapshot['productive'].count(1, block)))
+    to_boundary = 600 - seconds % 600
+    lines.append("Next block in: " + str(to_boundary//60) + ":" + str(to_boundary%60).zfill(2))
+    return lines
+
+
+# Entry point of the status command; return the exit status
+def main():
+    snapshot = read_plan_snapshot()
+    if snapshot is None:
+        print("No plan snapshot found, start 144 Blocks first")
+        return 1
+    print("\n".join(status_lines(snapshot)))
+    return 0
+
+
+# Running this module directly skips compiling 144_blocks.py, for the fastest status in shell prompts
+if __name__ == '__main__':
+    import sys
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Weekday plan templates with per-date overrides
+
+The plan of a day can be composed from two layers, both in the plan file
+format where missing blocks are left as they are:
+    ./templates/weekdays/<weekday>.ini     e.g. monday.ini, the base plan
+    ./templates/overrides/YYYY-MM-DD.ini   exceptions for one date
+
+Composed plans are cached on disk, keyed by the size and modification time
+of both layers, so loading a date only parses the layers again after one of
+them changed.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import marshal
+import os
+import threading
+
+from read_write import write_cache_file
+
+TEMPLATES_DIR = './templates/'
+MATERIALISED_CACHE_FILENAME = './cache/day_plans.cache'
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+# Cached plans of days older than this are dropped
+CACHE_DAYS_KEPT = 7
+
+
+def weekday_template_filename(day):
+    return os.path.join(TEMPLATES_DIR, 'weekdays', WEEKDAYS[day.weekday()] + '.ini')
+
+
+def override_filename(day):
+    return os.path.join(TEMPLATES_DIR, 'overrides', day.isoformat() + '.ini')
+
+
+# Return (size, mtime) of a file, or None if it is missing
+def file_key(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+# Return the blocks set in a plan layer file: {block index : activity}
+def read_plan_layer(filename):
+    from configobj import ConfigObj
+
+    config = ConfigObj(filename)
+    layer = {}
+    for row in range(24):
+        section = config.get(str(row).zfill(2), {})
+        for col in range(6):
+            if str(col)+'0' in section:
+                layer[row*6+col] = section[str(col)+'0']
+    return layer
+
+
+# Return the plan of a day composed from its weekday template and override (unlinked blocks where neither sets one)
+def compose_day_plan(day):
+    blocks = ['-1'] * 144
+    for filename in (weekday_template_filename(day), override_filename(day)):
+        if os.path.isfile(filename):
+            for index, activity in read_plan_layer(filename).items():
+                blocks[index] = activity
+    return [blocks[row*6:row*6+6] for row in range(24)]
+
+
+class MaterialisedPlans:
+    """Disk cache of composed day plans, invalidated when a layer changes"""
+    def __init__(self, cache_filename=MATERIALISED_CACHE_FILENAME):
+        self.cache_filename = cache_filename
+        self.lock = threading.Lock() # used from the prefetch thread too
+        try:
+            with open(self.cache_filename, 'rb') as f:
+                self.plans = marshal.load(f) # date -> ((template key, override key), plan)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.plans = {}
+
+    # Return the composed plan of a day, or None if the day has neither a weekday template nor an override
+    def get(self, day):
+        key = (file_key(weekday_template_filename(day)), file_key(override_filename(day)))
+        if key == (None, None):
+            return None
+        with self.lock:
+            entry = self.plans.get(day.isoformat())
+            if entry is not None and tuple(entry[0]) == key:
+                return [list(row) for row in entry[1]]
+            plan = compose_day_plan(day)
+            self.plans[day.isoformat()] = (key, plan)
+            self.prune(day)
+            self.save()
+        return plan
+
+    # Drop the plans of days long past
+    def prune(self, day):
+        from datetime import timedelta
+        oldest = (day - timedelta(days=CACHE_DAYS_KEPT)).isoformat()
+        for date in [date for date in self.plans if date < oldest]:
+            del self.plans[date]
+
+    # Write the cache to disk
+    def save(self):
+        write_cache_file(self.cache_filename, self.plans)
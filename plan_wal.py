@@ -0,0 +1,104 @@
+"""
+Write-ahead log of block edits
+
+Every block edit is appended to a small log of fixed-size binary records and
+synced to disk, so no edit is lost even if the application crashes before
+the next autosave. On startup the log is replayed over the autosaved plan;
+once an autosave has written the plan, the records it covers are dropped.
+
+Record layout (64 bytes, little endian):
+    double  unix time of the edit
+    uint8   block index (row*6 + col)
+    55s     activity name, utf-8, NUL padded ('-1' if unlinked)
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import os
+import struct
+import threading
+import time
+
+WAL_FILENAME = './cache/plan.wal'
+
+RECORD = struct.Struct('<dB55s')
+
+
+class PlanWAL:
+    """Append-only log of (block index, activity) edits"""
+    def __init__(self, filename=WAL_FILENAME):
+        self.filename = filename
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self.lock = threading.Lock() # compaction happens in the autosave thread
+        self.file = open(self.filename, 'ab')
+        # Offsets are logical: 'start' is the logical offset of the first byte in the file
+        self.start = 0
+        self.size = self.file.tell()
+        # Drop a partly written last record (from a crash), so new records stay aligned
+        if self.size % RECORD.size:
+            self.size -= self.size % RECORD.size
+            self.file.truncate(self.size)
+
+    # Logical offset of the end of the log
+    @property
+    def offset(self):
+        return self.start + self.size
+
+    # Append edits [(block index, activity)] with one write and one sync; return False if one can't be logged
+    def append(self, edits):
+        records = []
+        for (index, activity) in edits:
+            name = activity.encode('utf-8')
+            if len(name) > RECORD.size - 9:
+                return False
+            records.append(RECORD.pack(time.time(), index, name))
+
+        with self.lock:
+            self.file.write(b''.join(records))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.size += len(records) * RECORD.size
+        return True
+
+    # Return the logged edits [(block index, activity)] in order, ignoring a partly written last record
+    def replay(self):
+        with self.lock:
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+        edits = []
+        for position in range(0, len(data) - RECORD.size + 1, RECORD.size):
+            (_, index, name) = RECORD.unpack_from(data, position)
+            if index < 144:
+                edits.append((index, name.rstrip(b'\0').decode('utf-8')))
+        return edits
+
+    # Return True if the log has records written today
+    def is_from_today(self):
+        return self.size > 0 and time.localtime(os.path.getmtime(self.filename))[:3] == time.localtime()[:3]
+
+    # Drop the records before a logical offset (they are now in the saved plan)
+    def compact(self, offset):
+        with self.lock:
+            drop = offset - self.start
+            if drop <= 0:
+                return
+            with open(self.filename, 'rb') as f:
+                f.seek(drop)
+                tail = f.read()
+            temp_filename = self.filename + '.tmp'
+            with open(temp_filename, 'wb') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(temp_filename, self.filename)
+            self.file = open(self.filename, 'ab')
+            self.start = offset
+            self.size = len(tail)
+
+    # Drop every record, e.g. when the log is stale
+    def clear(self):
+        self.compact(self.offset)
@@ -0,0 +1,112 @@
+"""
+Constant time queries of productive blocks in a day plan
+
+Keeps, over the 144 blocks of a plan, the number of productive blocks before
+each block (prefix sums) and the first productive block at or after each
+block (next occurrence). Changing a block updates only the entries it
+affects, so counting productive blocks in any range, or finding the next
+productive block, never walks the grid.
+
+The index can also be built from a plan and settings file, to be queried from
+scripts:
+
+    from productive_index import load_productive_index
+    index = load_productive_index('./saved_plans/example_plan.ini', 'settings.ini')
+    index.remaining(index.block_at(datetime.now()))
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+NUM_BLOCKS = 144
+
+
+class ProductiveIndex:
+    """Prefix sums and next occurrences of the productive blocks of a plan"""
+    def __init__(self, mask=0):
+        """
+        Parameters:
+        -----------
+            mask : int
+                Productive blocks, bit i set if block i (row*6 + col) is productive
+        """
+        self.mask = mask
+        # prefix[i] is the number of productive blocks before block i
+        self.prefix = [0] * (NUM_BLOCKS + 1)
+        for index in range(NUM_BLOCKS):
+            self.prefix[index+1] = self.prefix[index] + (mask >> index & 1)
+        # next_block[i] is the first productive block at or after block i (NUM_BLOCKS if none)
+        self.next_block = [NUM_BLOCKS] * (NUM_BLOCKS + 1)
+        for index in range(NUM_BLOCKS - 1, -1, -1):
+            self.next_block[index] = index if mask >> index & 1 else self.next_block[index+1]
+
+    # Mark a block as productive or not, updating only the affected entries
+    def set(self, index, productive):
+        if bool(self.mask >> index & 1) == bool(productive):
+            return
+        self.mask ^= 1 << index
+        step = 1 if productive else -1
+        for i in range(index + 1, NUM_BLOCKS + 1):
+            self.prefix[i] += step
+        # only the blocks up to the changed block (back to the previous productive block) see a new next block
+        for i in range(index, -1, -1):
+            next_block = i if self.mask >> i & 1 else self.next_block[i+1]
+            if i < index and next_block == self.next_block[i]:
+                break
+            self.next_block[i] = next_block
+
+    # Return the number of productive blocks in blocks [start, end)
+    def count(self, start=0, end=NUM_BLOCKS):
+        start = max(0, min(start, NUM_BLOCKS))
+        end = max(start, min(end, NUM_BLOCKS))
+        return self.prefix[end] - self.prefix[start]
+
+    # Return the number of productive blocks in the plan
+    def total(self):
+        return self.prefix[NUM_BLOCKS]
+
+    # Return the number of productive blocks among the first num_blocks (completed) blocks
+    def elapsed(self, num_blocks):
+        return self.count(0, num_blocks)
+
+    # Return the number of productive blocks from block num_blocks onwards
+    def remaining(self, num_blocks):
+        return self.count(num_blocks, NUM_BLOCKS)
+
+    # Return the first productive block at or after a block, or None if there are none left
+    def next_productive(self, index):
+        if index >= NUM_BLOCKS:
+            return None
+        next_block = self.next_block[max(0, index)]
+        return None if next_block == NUM_BLOCKS else next_block
+
+    # Return the block containing a datetime (or time)
+    @staticmethod
+    def block_at(when):
+        return when.hour*6 + when.minute//10
+
+    # Return the start time of a block as 'HH:MM'
+    @staticmethod
+    def start_time(index):
+        return str(index//6).zfill(2) + ":" + str(index%6) + "0"
+
+
+# Return the ProductiveIndex of a plan (block_linking[row][col] of activity names) given the activity settings
+def plan_productive_index(block_linking, act_settings):
+    mask = 0
+    for row in range(24):
+        for col in range(6):
+            act = act_settings.get(block_linking[row][col])
+            if act is not None and str(act['productive']) == "True":
+                mask |= 1 << (row*6 + col)
+    return ProductiveIndex(mask)
+
+
+# Return the ProductiveIndex of a saved plan file, using the activities of a settings file
+def load_productive_index(plan_filename, settings_filename):
+    from read_write import read_saved_plan, load_settings_data
+
+    (_, _, act_settings, _) = load_settings_data(settings_filename)
+    return plan_productive_index(read_saved_plan(plan_filename), act_settings)
@@ -8,12 +8,27 @@ MIT License
 Copyright (c) 2019 Marco P. L. Ribeiro
 """
 
+import marshal
 import os
-import tkinter as tk
-from configobj import ConfigObj
+import struct
+import zlib
+
+# Snapshot of the parsed settings, so unchanged settings are not re-parsed at startup
+SETTINGS_CACHE_FILENAME = './cache/settings.cache'
+SETTINGS_CACHE_VERSION = 2
+
+# Tune settings used when the settings file has no [tunes] section
+# max_length : longest tune to play (seconds), 0 for no limit
+# target_loudness : mean volume (dB) tunes are normalised to
+DEFAULT_TUNE_SETTINGS = {'max_length': 300.0, 'target_loudness': -20.0}
+
+# configobj (and six) and tkinter are imported inside the functions that need
+# them, so that importing this module stays cheap at startup
 
 # Load activity linked to each block
 def read_saved_plan(filename):
+    from configobj import ConfigObj
+
     config = ConfigObj(filename)
 
     block_linking = []
@@ -27,8 +42,14 @@ def read_saved_plan(filename):
 
 # Write the activity linked to each block
 def write_saved_plan(filename,block_linking):
+    write_plan_file('./saved_plans/'+ filename + '.ini', block_linking)
+
+# Write a plan to any path, atomically (readers never see a half-written file)
+def write_plan_file(path, block_linking):
+    from configobj import ConfigObj
+
     config = ConfigObj()
-    config.filename = './saved_plans/'+ filename + '.ini'
+    config.filename = path + '.tmp'
 
     for row in range(24):
         config[str(row).zfill(2)] = {}
@@ -36,9 +57,30 @@ def write_saved_plan(filename,block_linking):
             config[str(row).zfill(2)][str(col)+'0'] = block_linking[row][col]
     
     config.write()
+    os.replace(config.filename, path)
+
+# Return the width of a PNG file from its header, or None if it is not a PNG
+def png_width(filepath):
+    try:
+        with open(filepath, 'rb') as f:
+            header = f.read(24)
+    except OSError:
+        return None
+    if len(header) < 24 or header[:8] != b'\x89PNG\r\n\x1a\n':
+        return None
+    return struct.unpack('>I', header[16:20])[0]
 
 # Function for shrinking the selected icon for use in the block
 def shrinkImage(filepath, size):
+    filename = os.path.basename(filepath)
+    resized_filepath = './resized/'+filename
+
+    # Skip the resize (and the Pillow import) if the resized icon is still current
+    if (os.path.isfile(resized_filepath)
+            and os.path.getmtime(resized_filepath) >= os.path.getmtime(filepath)
+            and png_width(resized_filepath) == size):
+        return resized_filepath
+
     import PIL
     from PIL import Image
 
@@ -47,13 +89,14 @@ def shrinkImage(filepath, size):
     wpercent = (basewidth / float(img.size[0]))
     hsize = int((float(img.size[1]) * float(wpercent)))
     img = img.resize((basewidth, hsize), PIL.Image.ANTIALIAS)
-    filename = os.path.basename(filepath)
-    img.save('./resized/'+filename)
+    img.save(resized_filepath)
 
-    return './resized/'+filename
+    return resized_filepath
+
+# Parse the settings file into plain data (no Tk objects), with resized icon paths
+def parse_settings_file(settings_filename):
+    from configobj import ConfigObj
 
-# Read the settings file
-def read_settings_file(settings_filename, tk_master):
     config = ConfigObj(settings_filename)
     
     main_text_colour=config['appearance']['main_text_colour']
@@ -64,17 +107,99 @@ def read_settings_file(settings_filename, tk_master):
 
     SIZE_SETTING = int(config['appearance']['button_size'])
 
-    acts = {}
+    act_settings = {}
     for act in config['activities']: # act = 'Sleep' etc.
-        act_image = tk.PhotoImage(master=tk_master, file=shrinkImage(config['activities'][act]['icon'],SIZE_SETTING))
-        acts[act] = dict({'icon':act_image, 'colour':config['activities'][act]['colour'], 'productive':config['activities'][act]['productive']})
+        source = config['activities'][act]['icon']
+        act_settings[act] = {'source':source, 'icon':shrinkImage(source,SIZE_SETTING),
+        'colour':config['activities'][act]['colour'], 'productive':config['activities'][act]['productive']}
+
+    tune_settings = dict(DEFAULT_TUNE_SETTINGS)
+    for setting in tune_settings:
+        if setting in config.get('tunes', {}):
+            tune_settings[setting] = float(config['tunes'][setting])
 
-    acts['-1'] = dict({'icon':tk.PhotoImage(master=tk_master, width=SIZE_SETTING, height=SIZE_SETTING), 'colour':unlinked_colour, 'productive':'False'})
     return ([main_text_colour, select_window_text_colour, background_colour, foreground_colour, unlinked_colour], 
-    SIZE_SETTING, acts)
+    SIZE_SETTING, act_settings, tune_settings)
+
+# Key identifying the exact settings file contents: (path, size, mtime, content hash)
+def settings_cache_key(settings_filename):
+    with open(settings_filename, 'rb') as f:
+        content = f.read()
+    stat = os.stat(settings_filename)
+    return (os.path.abspath(settings_filename), stat.st_size, stat.st_mtime_ns, zlib.crc32(content))
+
+# Return the cached settings data if it is still current, otherwise None
+def read_settings_cache(key):
+    try:
+        with open(SETTINGS_CACHE_FILENAME, 'rb') as f:
+            (version, cached_key, icon_mtimes, settings) = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if version != SETTINGS_CACHE_VERSION or tuple(cached_key) != key:
+        return None
+
+    # The cache is also stale if any icon changed, or a resized icon was removed
+    for act in settings[2].values():
+        if (not os.path.isfile(act['icon']) or not os.path.isfile(act['source'])
+                or icon_mtimes.get(act['source']) != os.stat(act['source']).st_mtime_ns):
+            return None
+    return settings
+
+# Write a value to a file with marshal, atomically (through a temporary file), creating its directory
+def write_marshal_file(filename, value):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as f:
+        marshal.dump(value, f)
+    os.replace(temp_filename, filename)
+
+# Write a cache file with write_marshal_file, ignoring errors as caching is only an optimisation
+def write_cache_file(filename, value):
+    try:
+        write_marshal_file(filename, value)
+    except OSError:
+        pass
+
+# Save a snapshot of the parsed settings data
+def write_settings_cache(key, settings):
+    icon_mtimes = {act['source']: os.stat(act['source']).st_mtime_ns for act in settings[2].values()}
+    write_marshal_file(SETTINGS_CACHE_FILENAME, (SETTINGS_CACHE_VERSION, key, icon_mtimes, settings))
+
+# Load the settings data, from the snapshot cache when the settings file is unchanged
+def load_settings_data(settings_filename):
+    key = settings_cache_key(settings_filename)
+    settings = read_settings_cache(key)
+    if settings is None:
+        settings = parse_settings_file(settings_filename)
+        try:
+            write_settings_cache(key, settings)
+        except OSError:
+            pass # caching is only an optimisation
+    return settings
+
+# Create the Tk image for each activity icon
+def create_activity_images(act_settings, size, unlinked_colour, tk_master):
+    import tkinter as tk
+
+    acts = {}
+    for act in act_settings:
+        act_image = tk.PhotoImage(master=tk_master, file=act_settings[act]['icon'])
+        acts[act] = dict({'icon':act_image, 'colour':act_settings[act]['colour'], 'productive':act_settings[act]['productive']})
+
+    acts['-1'] = dict({'icon':tk.PhotoImage(master=tk_master, width=size, height=size), 'colour':unlinked_colour, 'productive':'False'})
+    return acts
+
+# Read the settings file
+def read_settings_file(settings_filename, tk_master):
+    (colour_arr, SIZE_SETTING, act_settings, _) = load_settings_data(settings_filename)
+    acts = create_activity_images(act_settings, SIZE_SETTING, colour_arr[4], tk_master)
+    return (colour_arr, SIZE_SETTING, acts)
 
 # Recreate the default settings file
 def write_settings_file(settings_filename, tk_master):
+    from configobj import ConfigObj
+
     config = ConfigObj()
     config.filename = settings_filename
     
@@ -140,5 +265,7 @@ def write_settings_file(settings_filename, tk_master):
     }
 
     config['activities'] = activities
+
+    config['tunes'] = dict(DEFAULT_TUNE_SETTINGS)
     
     config.write()
@@ -0,0 +1,97 @@
+"""
+Memory-mapped status of the running application
+
+The current block, activity and productive counters are published into a
+small file with a fixed layout, so status bars (tmux, polybar, ...) can read
+them in microseconds without parsing any plan. Writes are guarded by a
+sequence counter (a seqlock): the writer makes the counter odd while it
+updates the record and even once done, so a reader retries if the counter
+is odd or changed while it was copying the record.
+
+Layout (80 bytes, little endian):
+    offset  0   4s      magic b'144B'
+    offset  4   uint32  sequence counter
+    offset  8   double  unix time of the update
+    offset 16   uint8   current block (row*6 + col)
+    offset 17   uint8   productive blocks completed
+    offset 18   uint8   productive blocks in the plan
+    offset 19   uint8   productive blocks left (including the current block)
+    offset 20   int16   next productive block after the current block (-1 if none)
+    offset 22   uint16  reserved
+    offset 24   56s     current activity, utf-8, NUL padded ('-1' if unlinked)
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import mmap
+import os
+import struct
+import time
+
+STATUS_FILENAME = './cache/status.bin'
+
+MAGIC = b'144B'
+SEQUENCE = struct.Struct('<I')
+SEQUENCE_OFFSET = 4
+RECORD = struct.Struct('<4sIdBBBBhH56s')
+
+
+class StatusWriter:
+    """Publishes the status record into a memory-mapped file"""
+    def __init__(self, filename=STATUS_FILENAME):
+        self.filename = filename
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != RECORD.size:
+                os.ftruncate(fd, RECORD.size)
+            self.map = mmap.mmap(fd, RECORD.size)
+        finally:
+            os.close(fd)
+        (self.sequence,) = SEQUENCE.unpack_from(self.map, SEQUENCE_OFFSET)
+        self.sequence += self.sequence % 2 # a writer may have died mid-update
+
+    # Publish a new status record
+    def publish(self, block, activity, elapsed, total, remaining, next_productive):
+        name = activity.encode('utf-8')[:56]
+        self.sequence += 1 # odd: update in progress
+        SEQUENCE.pack_into(self.map, SEQUENCE_OFFSET, self.sequence)
+        RECORD.pack_into(self.map, 0, MAGIC, self.sequence, time.time(), block, elapsed, total, remaining,
+                         -1 if next_productive is None else next_productive, 0, name)
+        self.sequence += 1 # even: update done
+        SEQUENCE.pack_into(self.map, SEQUENCE_OFFSET, self.sequence)
+
+    def close(self):
+        self.map.close()
+
+
+# Return the published status as a dict, or None if there is none
+def read_status(filename=STATUS_FILENAME, retries=100):
+    try:
+        with open(filename, 'rb') as f:
+            status_map = mmap.mmap(f.fileno(), RECORD.size, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        for _ in range(retries):
+            (before,) = SEQUENCE.unpack_from(status_map, SEQUENCE_OFFSET)
+            if before % 2:
+                continue
+            record = status_map[:RECORD.size]
+            (after,) = SEQUENCE.unpack_from(status_map, SEQUENCE_OFFSET)
+            if before == after:
+                break
+        else:
+            return None
+    finally:
+        status_map.close()
+
+    (magic, _, updated, block, elapsed, total, remaining, next_productive, _, name) = RECORD.unpack(record)
+    if magic != MAGIC:
+        return None
+    return {'updated':updated, 'block':block, 'activity':name.rstrip(b'\0').decode('utf-8', 'replace'),
+            'elapsed':elapsed, 'total':total, 'remaining':remaining,
+            'next_productive':None if next_productive == -1 else next_productive}
@@ -0,0 +1,117 @@
+"""
+Event-driven scheduling of activity transitions
+
+The day plan is compiled into the list of blocks at which the activity
+changes, and callbacks are registered on a heap for exactly those instants.
+A single Tk timer is armed for the earliest callback, and callbacks due at
+the same instant run in one wakeup, so nothing wakes up in the middle of a
+long stretch of the same activity.
+
+Subscribers are notified when an activity starts or ends:
+
+    token = scheduler.subscribe('Work', on_start=start_callback, on_end=end_callback)
+    scheduler.unsubscribe(token)
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+
+BLOCK_SECONDS = 600
+# Callbacks due within this many seconds run in the same wakeup
+TOLERANCE = 0.05
+
+
+# Return the unix time at which a block (0 to 144) of the day containing 'when' starts
+def block_start(index, when=None):
+    when = datetime.now() if when is None else when
+    midnight = datetime(when.year, when.month, when.day)
+    return (midnight + timedelta(seconds=index*BLOCK_SECONDS)).timestamp()
+
+
+# Return the transitions [(block index, old activity, new activity)] of a plan given as a sequence of 144 activities
+def compile_transitions(blocks):
+    return [(index, blocks[index-1], blocks[index]) for index in range(1, len(blocks)) if blocks[index] != blocks[index-1]]
+
+
+class TransitionScheduler:
+    """Heap of timed callbacks driven by a single Tk timer, with activity start/end subscriptions"""
+    def __init__(self, master):
+        """
+        Parameters:
+        -----------
+            master : Tk object
+                Used to arm the timer, so callbacks run in the Tk thread
+        """
+        self.master = master
+        self.heap = [] # (unix time, sequence number, tag, callback)
+        self.sequence = itertools.count()
+        self.timer = None
+        self.timer_due = None
+        self.subscribers = {} # token -> (activity or None for any, on_start, on_end)
+        self.tokens = itertools.count()
+
+    # Run a callback (without arguments) at a unix time; the tag allows cancelling it
+    def call_at(self, when, callback, tag=None):
+        heapq.heappush(self.heap, (when, next(self.sequence), tag, callback))
+        self.arm()
+
+    # Cancel the pending callbacks with a tag, or every pending callback if tag is None
+    def cancel(self, tag=None):
+        self.heap = [event for event in self.heap if tag is not None and event[2] != tag]
+        heapq.heapify(self.heap)
+        self.arm()
+
+    # Schedule notifications for the transitions [(block index, old activity, new activity)] after a block of today
+    def schedule_transitions(self, transitions, after_index, tag='transition'):
+        for (index, old, new) in transitions:
+            if index > after_index:
+                self.call_at(block_start(index), lambda old=old, new=new: self.notify(old, new), tag)
+
+    # Subscribe to the start and/or end of an activity (any activity if None); return a token to unsubscribe
+    def subscribe(self, activity=None, on_start=None, on_end=None):
+        token = next(self.tokens)
+        self.subscribers[token] = (activity, on_start, on_end)
+        return token
+
+    def unsubscribe(self, token):
+        self.subscribers.pop(token, None)
+
+    # Notify subscribers that 'old' ended and 'new' started
+    def notify(self, old, new):
+        for (activity, on_start, on_end) in list(self.subscribers.values()):
+            if on_end is not None and activity in (None, old):
+                on_end(old)
+        for (activity, on_start, on_end) in list(self.subscribers.values()):
+            if on_start is not None and activity in (None, new):
+                on_start(new)
+
+    # Arm the Tk timer for the earliest pending callback
+    def arm(self):
+        if len(self.heap) > 0 and self.timer is not None and self.timer_due == self.heap[0][0]:
+            return
+        if self.timer is not None:
+            self.master.after_cancel(self.timer)
+            self.timer = None
+        if len(self.heap) > 0:
+            self.timer_due = self.heap[0][0]
+            delay = max(1, int((self.timer_due - time.time()) * 1000) + 1)
+            self.timer = self.master.after(delay, self.run_due)
+
+    # Timer callback: run every callback that is due, then re-arm
+    def run_due(self):
+        self.timer = None
+        now = time.time()
+        while len(self.heap) > 0 and self.heap[0][0] <= now + TOLERANCE:
+            (_, _, _, callback) = heapq.heappop(self.heap)
+            try:
+                callback()
+            except Exception as err: # one failing callback must not stop the others
+                print("Scheduled callback failed: " + str(err))
+        self.arm()
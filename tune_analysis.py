@@ -0,0 +1,84 @@
+"""
+Duration and loudness analysis of the tunes
+
+Each tune is probed once with ffmpeg's volumedetect filter. Results are
+cached on disk keyed by the hash of the file contents (so renamed or copied
+tunes are not probed again), and in memory keyed by path, size and mtime (so
+files are not re-hashed on every block boundary).
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+import hashlib
+import marshal
+import os
+import re
+import subprocess
+
+from read_write import write_cache_file
+
+TUNE_CACHE_FILENAME = './cache/tunes.cache'
+
+_duration_re = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_mean_volume_re = re.compile(r"mean_volume: (-?\d+(?:\.\d+)?) dB")
+
+
+# Return the sha1 hex digest of a file's contents
+def file_hash(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+# Return (duration in seconds, mean volume in dB) of a tune using ffmpeg, or None if it can't be probed
+def probe_tune(filename):
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-nostats", "-i", filename, "-af", "volumedetect", "-f", "null", "-"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError:
+        return None
+    duration = _duration_re.search(result.stderr)
+    mean_volume = _mean_volume_re.search(result.stderr)
+    if duration is None or mean_volume is None:
+        return None
+    (hours, minutes, seconds) = duration.groups()
+    return (int(hours)*3600 + int(minutes)*60 + float(seconds), float(mean_volume.group(1)))
+
+
+class TuneAnalysis:
+    """Cache of (duration, mean volume) per tune"""
+    def __init__(self, cache_filename=TUNE_CACHE_FILENAME):
+        self.cache_filename = cache_filename
+        self.by_stat = {} # (path, size, mtime) -> analysis, for this session
+        try:
+            with open(self.cache_filename, 'rb') as f:
+                self.by_hash = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.by_hash = {}
+
+    # Return (duration, mean volume) of a tune, probing it only if its contents were never analysed (None if it can't be read)
+    def get(self, filename):
+        try:
+            stat = os.stat(filename)
+            stat_key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+            content_hash = None if stat_key in self.by_stat else file_hash(filename)
+        except OSError: # e.g. the tune was deleted or is unreadable
+            return None
+        if stat_key not in self.by_stat:
+            if content_hash not in self.by_hash:
+                analysis = probe_tune(filename)
+                if analysis is None:
+                    return None
+                self.by_hash[content_hash] = analysis
+                self.save()
+            self.by_stat[stat_key] = self.by_hash[content_hash]
+        return self.by_stat[stat_key]
+
+    # Write the analysis cache to disk
+    def save(self):
+        write_cache_file(self.cache_filename, self.by_hash)
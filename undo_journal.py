@@ -0,0 +1,62 @@
+"""
+Undo/redo journal for block edits
+
+Each edit is stored as a list of compact deltas (block index, old activity id,
+new activity id) rather than a copy of the whole plan. The journal is bounded
+both in number of edits and in total number of deltas, dropping the oldest
+edits first.
+
+Author: Marco P. L. Ribeiro
+
+MIT License
+Copyright (c) 2019 Marco P. L. Ribeiro
+"""
+
+from collections import deque
+
+
+class UndoJournal:
+    """Bounded undo/redo history of block deltas"""
+    def __init__(self, max_edits=200, max_deltas=144*20):
+        """
+        Parameters:
+        -----------
+            max_edits : int
+                Maximum number of edits that can be undone
+            max_deltas : int
+                Maximum number of block deltas kept over all undoable edits
+        """
+        self.max_edits = max_edits
+        self.max_deltas = max_deltas
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.num_deltas = 0
+
+    # Record an edit: deltas is [(block index, old activity id, new activity id)]
+    def record(self, deltas):
+        if len(deltas) == 0:
+            return
+        self.undo_stack.append(tuple(deltas))
+        self.num_deltas += len(deltas)
+        self.redo_stack = []
+
+        while len(self.undo_stack) > self.max_edits or (self.num_deltas > self.max_deltas and len(self.undo_stack) > 1):
+            self.num_deltas -= len(self.undo_stack.popleft())
+
+    # Return the deltas that revert the last edit, or None if there is nothing to undo
+    def undo(self):
+        if len(self.undo_stack) == 0:
+            return None
+        deltas = self.undo_stack.pop()
+        self.num_deltas -= len(deltas)
+        self.redo_stack.append(deltas)
+        return [(index, new, old) for (index, old, new) in reversed(deltas)]
+
+    # Return the deltas that re-apply the last undone edit, or None if there is nothing to redo
+    def redo(self):
+        if len(self.redo_stack) == 0:
+            return None
+        deltas = self.redo_stack.pop()
+        self.undo_stack.append(deltas)
+        self.num_deltas += len(deltas)
+        return list(deltas)